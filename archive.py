@@ -0,0 +1,195 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+from contextlib import closing
+from datetime import datetime, date, time, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from models_db import Event, RawLog, Alert, EventIndicator
+from rollups import record_events, prune_rollups
+
+logger = logging.getLogger(__name__)
+
+# hot / cold storage : events (and their raw logs) older than WT_RETENTION_DAYS move into one SQLite file per day
+# under WT_ARCHIVE_DIR, partitions older than WT_ARCHIVE_KEEP_DAYS are dropped, retention is off when unset
+ARCHIVE_DIR = os.getenv("WT_ARCHIVE_DIR", "./db/archive")
+RETENTION_DAYS = int(os.getenv("WT_RETENTION_DAYS", "0"))
+ARCHIVE_KEEP_DAYS = int(os.getenv("WT_ARCHIVE_KEEP_DAYS", "365"))
+RETENTION_INTERVAL = 60 * 60
+ARCHIVE_CHUNK_SIZE = 5000
+
+PARTITION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (id INTEGER PRIMARY KEY, timestamp TEXT, event_type TEXT, severity TEXT, message TEXT, asset_id INTEGER, occurrences INTEGER NOT NULL DEFAULT 1, last_seen TEXT);
+CREATE TABLE IF NOT EXISTS raw_logs (id INTEGER PRIMARY KEY, event_id INTEGER, raw_line BLOB, envelope TEXT, ingested_at TEXT);
+CREATE INDEX IF NOT EXISTS ix_events_timestamp ON events (timestamp);
+"""
+# columns added to partition tables after the first partitions were written
+# raw logs were first archived as one decompressed json raw_payload, they are now copied compressed as in the hot table
+PARTITION_ADDED_COLUMNS = {
+    "events": {"occurrences": "INTEGER NOT NULL DEFAULT 1", "last_seen": "TEXT"},
+    "raw_logs": {"raw_line": "BLOB", "envelope": "TEXT"},
+}
+
+def partition_columns(conn, schema: str = "main", table: str = "events") -> set:
+    return {row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")}
+
+def partition_path(day: date) -> str:
+    return os.path.join(ARCHIVE_DIR, f"events-{day.isoformat()}.db")
+
+def partition_days() -> list:
+    if not os.path.isdir(ARCHIVE_DIR):
+        return []
+    days = []
+    for name in os.listdir(ARCHIVE_DIR):
+        if name.startswith("events-") and name.endswith(".db"):
+            try:
+                days.append(date.fromisoformat(name[7:-3]))
+            except ValueError:
+                continue
+    return sorted(days)
+
+# oldest timestamp still kept in the hot tables
+def hot_boundary(now: datetime | None = None) -> datetime | None:
+    if RETENTION_DAYS <= 0:
+        return None
+    now = now or datetime.utcnow()
+    return datetime.combine(now.date() - timedelta(days=RETENTION_DAYS), time.min)
+
+# events with alerts or indicator hits stay hot so those keep their event
+def archivable():
+    return ~Event.id.in_(select(Alert.event_id).union(select(EventIndicator.event_id)))
+
+# move one day of events (and raw logs) into its partition, the partition file is only created when there is something to move
+def archive_day(db: Session, day: date) -> int:
+    start = datetime.combine(day, time.min)
+    end = start + timedelta(days=1)
+    next_chunk = lambda: db.query(Event).filter(Event.timestamp >= start, Event.timestamp < end, archivable()).order_by(Event.id).limit(ARCHIVE_CHUNK_SIZE).all()
+    events = next_chunk()
+    if not events:
+        return 0
+    moved = 0
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+    with closing(sqlite3.connect(partition_path(day))) as partition:
+        partition.executescript(PARTITION_SCHEMA)
+        for table, added in PARTITION_ADDED_COLUMNS.items():
+            columns = partition_columns(partition, table=table)
+            for name, kind in added.items():
+                if name not in columns:
+                    partition.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+        while events:
+            ids = [event.id for event in events]
+            rawlogs = db.query(RawLog).filter(RawLog.event_id.in_(ids)).all()
+            # partition first : a crash in between leaves a copy in both places, never in neither
+            with partition:
+                partition.executemany("INSERT OR REPLACE INTO events (id, timestamp, event_type, severity, message, asset_id, occurrences, last_seen) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(e.id, e.timestamp.isoformat(" "), e.event_type, e.severity, e.message, e.asset_id, e.occurrences or 1, e.last_seen and e.last_seen.isoformat(" ")) for e in events])
+                partition.executemany("INSERT OR REPLACE INTO raw_logs (id, event_id, raw_line, envelope, ingested_at) VALUES (?, ?, ?, ?, ?)",
+                    [(r.id, r.event_id, r.raw_line, r.envelope, r.ingested_at.isoformat(" ")) for r in rawlogs])
+            db.query(RawLog).filter(RawLog.event_id.in_(ids)).delete(synchronize_session=False)
+            db.query(Event).filter(Event.id.in_(ids)).delete(synchronize_session=False)
+            record_events(db, events, -1)
+            db.commit()
+            db.expunge_all()
+            moved += len(ids)
+            events = next_chunk()
+    return moved
+
+# prune old dashboard rollups, archive every day past the retention window, then drop partitions past the keep window
+def run_retention(db: Session, now: datetime | None = None) -> int:
+    prune_rollups(db, now)
+    boundary = hot_boundary(now)
+    if boundary is None:
+        return 0
+    moved = 0
+    # jump from one archivable day to the next, days holding only kept events are never visited
+    while (oldest := db.query(func.min(Event.timestamp)).filter(Event.timestamp < boundary, archivable()).scalar()) is not None:
+        day_moved = archive_day(db, oldest.date())
+        if not day_moved:
+            break
+        moved += day_moved
+    drop_before = boundary.date() - timedelta(days=ARCHIVE_KEEP_DAYS)
+    for day in partition_days():
+        if day < drop_before:
+            os.remove(partition_path(day))
+    return moved
+
+# run the query built by sql(conn) against each partition of days (attached as "part"), newest first, until limit rows
+# sql gets the connection because older partitions lack the columns added since
+def query_partitions(days: list, sql, params: list, limit: int) -> list:
+    rows = []
+    with closing(sqlite3.connect(":memory:", uri=True)) as conn:
+        for day in reversed(days):
+            if len(rows) >= limit:
+                break
+            conn.execute("ATTACH DATABASE ? AS part", (f"file:{partition_path(day)}?mode=ro",))
+            try:
+                rows.extend(conn.execute(sql(conn), (*params, limit - len(rows))).fetchall())
+            finally:
+                conn.execute("DETACH DATABASE part")
+    return rows
+
+# WHERE clause and params of a [start, end) window on time_column, ids below before_id, with equals column = value
+def window_filter(time_column: str, id_column: str, start: datetime, end: datetime, before_id: int | None, equals: dict) -> tuple:
+    clauses, params = [f"{time_column} >= ?", f"{time_column} < ?"], [start.isoformat(" "), end.isoformat(" ")]
+    if before_id is not None:
+        clauses.append(f"{id_column} < ?")
+        params.append(before_id)
+    for name, value in equals.items():
+        clauses.append(f"{name} = ?")
+        params.append(value)
+    return " AND ".join(clauses), params
+
+# partitions written before dedup have no occurrences / last_seen
+def event_columns(conn, alias: str = "") -> str:
+    prefix = f"{alias}." if alias else ""
+    added = f"{prefix}occurrences, {prefix}last_seen" if "occurrences" in partition_columns(conn, "part") else "1, NULL"
+    return ", ".join(f"{prefix}{name}" for name in ("id", "timestamp", "event_type", "severity", "message", "asset_id")) + ", " + added
+
+def event_row(r) -> dict:
+    return {"id": r[0], "timestamp": datetime.fromisoformat(r[1]), "event_type": r[2], "severity": r[3], "message": r[4], "asset_id": r[5],
+        "occurrences": r[6], "last_seen": r[7] and datetime.fromisoformat(r[7])}
+
+# archived events inside [start, end), newest first, only the partitions overlapping the window get attached
+# equals maps partition columns (severity, asset_id, event_type) to the value they must match
+def read_archived_events(start: datetime, end: datetime | None, limit: int, before_id: int | None = None, **equals) -> list:
+    end = end or datetime.utcnow()
+    days = [day for day in partition_days() if start.date() <= day <= end.date()]
+    where, params = window_filter("timestamp", "id", start, end, before_id, equals)
+    sql = lambda conn: f"SELECT {event_columns(conn)} FROM part.events WHERE {where} ORDER BY id DESC LIMIT ?"
+    return [event_row(r) for r in query_partitions(days, sql, params, limit)]
+
+# archived raw logs ingested inside [start, end), newest first, each with its archived event
+# the line is unpacked here, rows archived before raw logs were copied compressed carry the json raw_payload instead
+def read_archived_rawlogs(start: datetime, end: datetime | None, limit: int, before_id: int | None = None, event_id: int | None = None) -> list:
+    end = end or datetime.utcnow()
+    # a raw log can be ingested just after midnight of its event's day
+    days = [day for day in partition_days() if start.date() - timedelta(days=1) <= day <= end.date()]
+    where, params = window_filter("r.ingested_at", "r.id", start, end, before_id, {"r.event_id": event_id} if event_id is not None else {})
+    def sql(conn):
+        legacy = "r.raw_payload" if "raw_payload" in partition_columns(conn, "part", "raw_logs") else "NULL"
+        return (f"SELECT r.id, r.ingested_at, r.raw_line, r.envelope, {legacy}, {event_columns(conn, 'e')} FROM part.raw_logs r "
+            f"JOIN part.events e ON e.id = r.event_id WHERE {where} ORDER BY r.id DESC LIMIT ?")
+    rows = []
+    for r in query_partitions(days, sql, params, limit):
+        payload = json.loads(r[4]) if r[4] is not None else RawLog(raw_line=r[2], envelope=r[3]).raw_payload
+        event = event_row(r[5:])
+        rows.append({"id": r[0], "ingested_at": datetime.fromisoformat(r[1]), "raw_payload": payload, "event_id": event["id"], "event": event})
+    return rows
+
+# background housekeeping, runs RETENTION_INTERVAL apart while the app is up
+async def retention_loop(session_factory):
+    while True:
+        try:
+            with session_factory() as db:
+                if moved := await asyncio.to_thread(run_retention, db):
+                    logger.info("archived %d events", moved)
+        except Exception:
+            logger.exception("retention run failed")
+        await asyncio.sleep(RETENTION_INTERVAL)
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    with SessionLocal() as db:
+        print(f"archived {run_retention(db)} events")
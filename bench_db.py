@@ -0,0 +1,61 @@
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from sqlalchemy import func
+from sqlalchemy.orm import sessionmaker
+from database import SQLITE_PROFILES, create_sqlite_engine
+from models_db import Base, Asset, Event
+
+# ingest commits/sec and dashboard read latency for each SQLite storage profile
+# usage : python bench_db.py [commits]
+
+def bench_profile(profile: str, commits: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_sqlite_engine(f"sqlite:///{tmp}/bench.db", profile)
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with Session() as db:
+            asset = Asset(name="bench", asset_type="router", ip_address="10.0.0.1", environment="bench")
+            db.add(asset)
+            db.commit()
+            asset_id = asset.id
+
+        done = threading.Event()
+        latencies = []
+
+        # dashboard style reader polling while the writer commits
+        def reader():
+            with Session() as db:
+                while not done.is_set():
+                    start = time.perf_counter()
+                    db.query(Event.severity, func.count(Event.id)).group_by(Event.severity).all()
+                    db.rollback()
+                    latencies.append(time.perf_counter() - start)
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        start = time.perf_counter()
+        with Session() as db:
+            for i in range(commits):
+                db.add(Event(event_type="acl_deny", severity=str(i % 8), message="bench", asset_id=asset_id))
+                db.commit()
+        elapsed = time.perf_counter() - start
+        done.set()
+        thread.join()
+        engine.dispose()
+
+    latencies.sort()
+    return {
+        "commits_per_sec": commits / elapsed,
+        "read_p50_ms": statistics.median(latencies) * 1000 if latencies else 0.0,
+        "read_p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0.0,
+        "reads": len(latencies),
+    }
+
+if __name__ == "__main__":
+    commits = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    for profile in SQLITE_PROFILES:
+        result = bench_profile(profile, commits)
+        print(f"{profile:<6} {result['commits_per_sec']:8.0f} commits/s   read p50 {result['read_p50_ms']:6.2f} ms   p95 {result['read_p95_ms']:6.2f} ms   ({result['reads']} reads)")
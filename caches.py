@@ -0,0 +1,337 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque, OrderedDict
+from socket import inet_pton, AF_INET, AF_INET6
+from datetime import datetime, timedelta
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from models_db import Asset, Event, Alert, Incident, IncidentAlert, Indicator
+
+# process wide snapshot built by `loader(db)`, rebuilt only after invalidate() bumps the version
+class VersionedCache:
+    def __init__(self, loader):
+        self.loader = loader
+        self.version = 0
+        self._built_version = -1
+        self._value = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def get(self, db: Session):
+        if self._built_version == self.version:
+            return self._value
+        with self._lock:
+            version = self.version
+            if self._built_version != version:
+                self._value = self.loader(db)
+                self._built_version = version
+            return self._value
+
+
+# Assets --------------------------------------------------------------------------------------------------------------------
+# ip -> asset id map plus the fallback source ip used when a log carries none
+class AssetMap:
+    __slots__ = ("by_ip", "fallback_ip")
+
+    def __init__(self, assets: list):
+        self.by_ip = {}
+        self.fallback_ip = assets[0].ip_address if assets else None
+        for asset in assets:
+            if asset.ip_address:
+                self.by_ip.setdefault(asset.ip_address, asset.id)
+
+def load_asset_map(db: Session) -> AssetMap:
+    return AssetMap(db.query(Asset).order_by(Asset.id.asc()).all())
+
+asset_cache = VersionedCache(load_asset_map)
+
+
+# Bursts --------------------------------------------------------------------------------------------------------------------
+BURST_WINDOW = timedelta(minutes=5)
+EVENT_BURST_SIZE = 5
+ALERT_BURST_SIZE = 3
+
+# sliding windows replacing the per log COUNT / join queries of the burst checks
+class BurstWindows:
+    def __init__(self):
+        self.events = {}  # (asset_id, event_type) -> deque of event timestamps inside the window
+        self.alerts = {}  # asset_id -> deque of the latest (event timestamp, event type, alert id)
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    # warm start from whatever the db holds inside the window
+    def load(self, db: Session):
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            window_start = datetime.utcnow() - BURST_WINDOW
+            events = (db.query(Event.asset_id, Event.event_type, Event.timestamp).filter(Event.timestamp >= window_start).order_by(Event.timestamp).all())
+            for asset_id, event_type, timestamp in events:
+                self.add_event(asset_id, event_type, timestamp)
+            alerts = (db.query(Alert.id, Event.asset_id, Event.event_type, Event.timestamp).join(Event).filter(Event.timestamp >= window_start).order_by(Event.timestamp).all())
+            for alert_id, asset_id, event_type, timestamp in alerts:
+                self.add_alert(asset_id, event_type, timestamp, alert_id)
+            self.loaded = True
+
+    # drop everything and warm start again on next use, after a write that rolled back
+    def invalidate(self):
+        with self._lock:
+            self.events = {}
+            self.alerts = {}
+            self.loaded = False
+
+    # prunes here too, event_burst isn't called for every event (severity 7 / None skip it)
+    def add_event(self, asset_id: int, event_type: str, timestamp: datetime):
+        window_start = datetime.utcnow() - BURST_WINDOW
+        if timestamp < window_start:
+            return
+        timestamps = self.events.setdefault((asset_id, event_type), deque())
+        while timestamps and timestamps[0] < window_start:
+            timestamps.popleft()
+        timestamps.append(timestamp)
+
+    def add_alert(self, asset_id: int, event_type: str, timestamp: datetime, alert_id: int):
+        self.alerts.setdefault(asset_id, deque(maxlen=ALERT_BURST_SIZE)).append((timestamp, event_type, alert_id))
+
+    # at least EVENT_BURST_SIZE events of this type on the asset inside the window
+    def event_burst(self, asset_id: int, event_type: str, now: datetime) -> bool:
+        key = (asset_id, event_type)
+        timestamps = self.events.get(key)
+        if timestamps is None:
+            return False
+        window_start = now - BURST_WINDOW
+        while timestamps and timestamps[0] < window_start:
+            timestamps.popleft()
+        if not timestamps:
+            del self.events[key]
+            return False
+        return len(timestamps) >= EVENT_BURST_SIZE
+
+    # ids of the last ALERT_BURST_SIZE alerts on the asset if they are all inside the window and of this type
+    def alert_burst(self, asset_id: int, event_type: str, now: datetime) -> list:
+        latest = self.alerts.get(asset_id)
+        if latest is None or len(latest) < ALERT_BURST_SIZE:
+            return []
+        window_start = now - BURST_WINDOW
+        if any(timestamp < window_start or alert_type != event_type for timestamp, alert_type, _ in latest):
+            return []
+        return [alert_id for _, _, alert_id in reversed(latest)]
+
+burst_windows = BurstWindows()
+
+
+# Incidents --------------------------------------------------------------------------------------------------------------------
+INCIDENT_WINDOW = timedelta(minutes=60)
+
+# (asset_id, event_type) -> open incident created inside the window, replacing the incident / alert / event join
+class IncidentIndex:
+    def __init__(self):
+        self.open = {}  # (asset_id, event_type) -> (incident id, created_at)
+        self.loaded = False
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            window_start = datetime.utcnow() - INCIDENT_WINDOW
+            rows = (db.query(Event.asset_id, Event.event_type, Incident.id, Incident.created_at)
+                .join(IncidentAlert, IncidentAlert.incident_id == Incident.id)
+                .join(Alert, Alert.id == IncidentAlert.alert_id)
+                .join(Event, Event.id == Alert.event_id)
+                .filter(Incident.status == "open", Incident.created_at >= window_start)
+                .order_by(Incident.id)
+                .all())
+            open_incidents = {}
+            for asset_id, event_type, incident_id, created_at in rows:
+                open_incidents.setdefault((asset_id, event_type), (incident_id, created_at))
+            self.open = open_incidents
+            self.loaded = True
+
+    # force a reload on next use, for changes made outside the ingest path
+    def invalidate(self):
+        self.loaded = False
+
+    # the writer thread adds / gets while HTTP threads discard, every access to self.open holds the lock
+    def add(self, asset_id: int, event_type: str, incident_id: int, created_at: datetime):
+        with self._lock:
+            self.open[(asset_id, event_type)] = (incident_id, created_at)
+
+    def discard(self, incident_id: int):
+        with self._lock:
+            for key in [key for key, (open_id, _) in self.open.items() if open_id == incident_id]:
+                del self.open[key]
+
+    def get(self, asset_id: int, event_type: str, now: datetime):
+        key = (asset_id, event_type)
+        with self._lock:
+            entry = self.open.get(key)
+            if entry is None:
+                return None
+            if entry[1] < now - INCIDENT_WINDOW:
+                del self.open[key]
+                return None
+            return entry[0]
+
+incident_index = IncidentIndex()
+
+
+# Dedup --------------------------------------------------------------------------------------------------------------------
+# repeats of a matched log inside WT_DEDUP_WINDOW seconds of its first sighting fold into the first Event
+# (occurrences / last_seen) instead of new rows, 0 turns it off
+DEDUP_WINDOW = timedelta(seconds=int(os.getenv("WT_DEDUP_WINDOW", "60")))
+DEDUP_MAX_ENTRIES = int(os.getenv("WT_DEDUP_MAX_ENTRIES", "10000"))
+
+class DedupIndex:
+    def __init__(self, window: timedelta = DEDUP_WINDOW, max_entries: int = DEDUP_MAX_ENTRIES):
+        self.window = window
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # fingerprint -> (event id, first seen), least recently hit first
+
+    # None when dedup is off, the log then always becomes its own event
+    def fingerprint(self, parsed_log: dict, matched_rules: list, asset_id: int):
+        if not self.window:
+            return None
+        return (parsed_log["log_type"], asset_id, parsed_log["src_ip"], parsed_log["src_port"], parsed_log["dst_ip"], parsed_log["dst_port"], matched_rules[0].id)
+
+    # id of the event this fingerprint folds into, None once its window is over
+    def get(self, key: tuple, now: datetime):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] < now - self.window:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def add(self, key: tuple, event_id: int, first_seen: datetime):
+        self.entries[key] = (event_id, first_seen)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    # events deleted outside the ingest path, forget every fingerprint
+    def invalidate(self):
+        self.entries = OrderedDict()
+
+dedup_index = DedupIndex()
+
+
+# Indicators --------------------------------------------------------------------------------------------------------------------
+# IOC lookups for the src_ip / dst_ip of every ingested event
+#   ip indicators : per ip version and prefix length, a sorted array of network numbers with a parallel array of indicator
+#                   ids (a flattened prefix tree), an address costs one bisect per prefix length present (/32 for plain ips)
+#                   and IPv4 entries take 8 bytes each, so a million fit in a few MB
+#   domains       : plain dict, matched against source / destination values that aren't addresses
+# hash indicators are stored but no parsed field carries a hash yet
+INDICATOR_LOAD_CHUNK = 50000
+
+# (ip version, address number, bits) of an address, None for anything else (ipaddress is too slow per log)
+def address_number(value: str):
+    try:
+        if ":" in value:
+            return 6, int.from_bytes(inet_pton(AF_INET6, value), "big"), 128
+        return 4, int.from_bytes(inet_pton(AF_INET, value), "big"), 32
+    except OSError:
+        return None
+
+class IndicatorIndex:
+    __slots__ = ("networks", "domains")
+
+    def __init__(self, rows):
+        pending = {}  # (version, prefix length) -> [(network number, indicator id)]
+        self.domains = {}
+        for indicator_id, indicator_type, value in rows:
+            if indicator_type == "ip":
+                # stored values are normalized : an address, or a network address / prefix length
+                address, _, prefix = value.partition("/")
+                version, number, bits = address_number(address)
+                pending.setdefault((version, int(prefix) if prefix else bits), []).append((number, indicator_id))
+            elif indicator_type == "domain":
+                self.domains.setdefault(value, indicator_id)
+        self.networks = {4: [], 6: []}
+        for (version, prefix), entries in sorted(pending.items(), reverse=True):
+            entries.sort()
+            # IPv6 numbers don't fit an array item
+            numbers = array("I", [number for number, _ in entries]) if version == 4 else [number for number, _ in entries]
+            self.networks[version].append((prefix, numbers, array("I", [indicator_id for _, indicator_id in entries])))
+
+    # ids of every indicator matching the value, most specific range first
+    def match(self, value) -> list:
+        if not value:
+            return []
+        address = address_number(str(value))
+        if address is None:
+            indicator_id = self.domains.get(str(value).lower().rstrip("."))
+            return [indicator_id] if indicator_id is not None else []
+        version, number, bits = address
+        hits = []
+        for prefix, numbers, ids in self.networks[version]:
+            network = number >> (bits - prefix) << (bits - prefix)
+            i = bisect_left(numbers, network)
+            while i < len(numbers) and numbers[i] == network:
+                hits.append(ids[i])
+                i += 1
+        return hits
+
+def load_indicator_index(db: Session) -> IndicatorIndex:
+    rows = db.execute(select(Indicator.id, Indicator.indicator_type, Indicator.value).execution_options(yield_per=INDICATOR_LOAD_CHUNK))
+    return IndicatorIndex(rows)
+
+indicator_cache = VersionedCache(load_indicator_index)
+
+
+# Dashboard responses --------------------------------------------------------------------------------------------------------
+# serialized endpoint bodies reused until the data version moves (committed rollup writes bump it) or the TTL runs out,
+# the TTL covers results that shift with the clock alone (24h windows, bucket labels)
+DASHBOARD_CACHE_TTL = 10
+
+class ResponseCache:
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.version = 0
+        self._entries = {}
+        self._builds = {}  # key -> lock held while that key is built
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+
+    def _fresh(self, key: str):
+        entry = self._entries.get(key)
+        return entry if entry is not None and entry[0] == self.version and entry[1] >= time.monotonic() else None
+
+    # (body, etag) for key, build() returns the json-able data, concurrent misses on one key wait for a single build
+    # while other keys are served and built meanwhile
+    def get(self, key: str, build) -> tuple:
+        with self._lock:
+            if (entry := self._fresh(key)) is not None:
+                return entry[2], entry[3]
+            build_lock = self._builds.setdefault(key, threading.Lock())
+        with build_lock:
+            with self._lock:
+                if (entry := self._fresh(key)) is not None:
+                    return entry[2], entry[3]
+                version = self.version
+            body = json.dumps(build(), separators=(",", ":")).encode()
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            with self._lock:
+                # an invalidate() during the build leaves the entry stale for the next get
+                self._entries[key] = (version, time.monotonic() + self.ttl, body, etag)
+            return body, etag
+
+dashboard_cache = ResponseCache(DASHBOARD_CACHE_TTL)
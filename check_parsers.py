@@ -0,0 +1,102 @@
+import os
+import random
+import re
+import sys
+from datetime import datetime
+
+# parse_cisco_log must return exactly what the sequential regex extractor it replaced returned
+# usage : python check_parsers.py [generated lines] , runs parser_corpus.txt plus seeded random lines and exits 1 on any diff
+
+GENERATED_LINES = 200000
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "parser_corpus.txt")
+
+# reference : the extractor as it was before the single pass rewrite, keep it frozen
+REFERENCE_CONTEXT = re.compile(r'%([A-Z0-9_]+)-(\d+)-([A-Z0-9_]+):')
+REFERENCE_TIME = re.compile(r'^(\w+\s+\d+\s+\d+\s+\d+:\d+:\d+)')
+REFERENCE_IDS = {
+    "src_ip": [
+        re.compile(r'\[Source:\s*(\d{1,3}(?:\.\d{1,3}){3})\]', re.IGNORECASE),
+        re.compile(r'from\s+(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
+        re.compile(r'Src IP:\s*(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
+    ],
+    "dst_ip": [
+        re.compile(r'to\s+(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
+        re.compile(r'Dst IP:\s*(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
+    ],
+    "src_port": [
+        re.compile(r'source port\s+(\d+)', re.IGNORECASE),
+        re.compile(r'from\s+\d{1,3}(?:\.\d{1,3}){3}\s+port\s+(\d+)', re.IGNORECASE),
+    ],
+    "dst_port": [
+        re.compile(r'\[localport:\s*(\d+)\]', re.IGNORECASE),
+        re.compile(r'to\s+\d{1,3}(?:\.\d{1,3}){3}\s+port\s+(\d+)', re.IGNORECASE),
+    ],
+}
+
+def reference_parse_cisco_log(log_line: str) -> dict:
+    from parsers import FACILITY_MNEMONIC_LOGTYPE_MAP
+    result = {"facility": None, "severity": None, "mnemonic": None, "timestamp": None, "src_ip": None, "src_port": None, "dst_ip": None, "dst_port": None, "log_type": None}
+    context_match = REFERENCE_CONTEXT.search(log_line)
+    if context_match:
+        result["facility"] = context_match.group(1)
+        result["severity"] = int(context_match.group(2))
+        result["mnemonic"] = context_match.group(3)
+        result["log_type"] = FACILITY_MNEMONIC_LOGTYPE_MAP.get((result["facility"], result["mnemonic"]), "system")
+    timestamp_match = REFERENCE_TIME.match(log_line)
+    if timestamp_match:
+        ts_str = timestamp_match.group(1)
+        try:
+            result["timestamp"] = datetime.strptime(ts_str, "%b %d %Y %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            result["timestamp"] = ts_str
+    for field, regex_list in REFERENCE_IDS.items():
+        for regex in regex_list:
+            match = regex.search(log_line)
+            if match:
+                value = match.group(1)
+                result[field] = int(value) if field.endswith("_port") else value
+                break
+    return result
+
+# random lines built from the fragments the extractors care about, with their case and spacing shuffled
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec", "jan", "SEP", "Foo", "June")
+CONTEXTS = ("%SEC-6-IPACCESSLOGD:", "%SEC-6-IPACCESSLOGP:", "%SEC_LOGIN-4-LOGIN_FAILED:", "%LINK-3-UPDOWN:", "%SYS-5-CONFIG_I:", "%FOO-1-BAR:", "%sec-6-x:", "%-1-:")
+
+def random_ip(rng: random.Random) -> str:
+    return ".".join(str(rng.choice((rng.randint(0, 255), rng.randint(0, 999)))) for _ in range(rng.choice((4, 4, 4, 3, 5))))
+
+def random_fragment(rng: random.Random) -> str:
+    space = rng.choice((" ", " ", "  ", "\t", ""))
+    port = str(rng.choice((rng.randint(0, 65535), rng.randint(0, 10 ** 9))))
+    fragment = rng.choice((
+        f"from{space}{random_ip(rng)}", f"from {random_ip(rng)}{space}port{space}{port}", f"to{space}{random_ip(rng)}",
+        f"to {random_ip(rng)} port {port}", f"[Source:{space}{random_ip(rng)}]", f"Src IP:{space}{random_ip(rng)}",
+        f"Dst IP:{space}{random_ip(rng)}", f"source port{space}{port}", f"[localport:{space}{port}]", rng.choice(CONTEXTS),
+        "denied tcp", "Login failed [user: admin]", "proto", "auto", "goto", "port", "[Source:]", "%", "[", "ümlaut",
+    ))
+    return "".join(c.swapcase() if rng.random() < 0.05 else c for c in fragment)
+
+def random_line(rng: random.Random) -> str:
+    head = ""
+    if rng.random() < 0.9:
+        day, year = rng.choice((rng.randint(1, 31), rng.randint(0, 99))), rng.choice((2026, 2024, 26, 99999, "0026"))
+        head = f"{rng.choice(MONTHS)} {day} {year} {rng.randint(0, 25)}:{rng.randint(0, 61):02d}:{rng.randint(0, 61)} "
+    return head + "R1 " + " ".join(random_fragment(rng) for _ in range(rng.randint(0, 8)))
+
+def check_parsers(generated: int = GENERATED_LINES) -> list:
+    from parsers import parse_cisco_log
+    with open(CORPUS_PATH, encoding="utf-8") as corpus:
+        lines = corpus.read().split("\n")
+    rng = random.Random(0)
+    lines += [random_line(rng) for _ in range(generated)]
+    return [(line, expected, actual) for line in lines if (expected := reference_parse_cisco_log(line)) != (actual := parse_cisco_log(line))]
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    generated = int(sys.argv[1]) if len(sys.argv) > 1 else GENERATED_LINES
+    diffs = check_parsers(generated)
+    for line, expected, actual in diffs[:20]:
+        print(f"{line!r}\n  expected {expected}\n  actual   {actual}")
+    print(f"{len(diffs)} diffs")
+    if diffs:
+        sys.exit(1)
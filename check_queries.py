@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+
+# statements per endpoint must not grow with the page size (no N+1 lazy loads)
+# usage : python check_queries.py , runs against a throwaway SQLite database and exits 1 on any endpoint that grows
+
+SEED_ROWS = 60
+SMALL_PAGE, LARGE_PAGE = 5, 50
+LIST_ENDPOINTS = ("/users/", "/roles/", "/assets/", "/events/", "/rawlogs/", "/rules/", "/alerts/", "/incidents/", "/auditlogs/")
+
+def seed(db):
+    from models_db import User, Role, Asset, Event, RawLog, Rule, RuleCondition, Alert, Incident, AuditLog
+    roles = [Role(name=f"role{i}") for i in range(3)]
+    users = [User(username=f"user{i}", email=f"user{i}@example.com", password_hash="x", roles=roles[:2]) for i in range(SEED_ROWS)]
+    assets = [Asset(name=f"r{i}", asset_type="router", ip_address=f"10.0.0.{i}", environment="prod") for i in range(SEED_ROWS)]
+    events = [Event(event_type="acl_deny", severity="3", message="seed", asset=asset) for asset in assets]
+    rawlogs = [RawLog(raw_payload={"log": "seed"}, event=event) for event in events]
+    rules = [Rule(name=f"rule{i}", description="seed", severity="3",
+        conditions=[RuleCondition(field="log_type", operator="eq", value="acl_deny"), RuleCondition(field="dst_port", operator="eq", value="22")]) for i in range(SEED_ROWS)]
+    alerts = [Alert(severity="3", rule=rule, event=event) for rule, event in zip(rules, events)]
+    # the first incident holds one alert, the second all of them, both must update in the same number of statements
+    incidents = [Incident(title=f"incident{i}", description="seed", severity="3", alerts=alerts[:1] if i == 0 else alerts if i == 1 else alerts[i:i + 3]) for i in range(SEED_ROWS)]
+    audits = [AuditLog(action="seed", target_type="event", target_id=i, user=user) for i, user in enumerate(users)]
+    db.add_all([*roles, *users, *assets, *events, *rawlogs, *rules, *alerts, *incidents, *audits])
+    db.commit()
+    return {"small incident": incidents[0].id, "large incident": incidents[1].id}
+
+def count_statements(engines, call) -> int:
+    from sqlalchemy import event
+    statements = []
+    def count(*args):
+        statements.append(1)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", count)
+    try:
+        response = call()
+        assert response.status_code < 400, f"{response.request.url} -> {response.status_code} {response.text}"
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", count)
+    return len(statements)
+
+def check_queries() -> dict:
+    import database, init_db, main
+    from fastapi.testclient import TestClient
+    init_db.init_db()
+    with database.SessionLocal() as db:
+        ids = seed(db)
+    engines = {database.write_engine, database.read_engine}
+    # no context manager : the ingest pipeline and syslog listener stay off
+    client = TestClient(main.app)
+    results = {}
+    for path in LIST_ENDPOINTS:
+        small = count_statements(engines, lambda: client.get(path, params={"limit": SMALL_PAGE}))
+        large = count_statements(engines, lambda: client.get(path, params={"limit": LARGE_PAGE}))
+        results[f"GET {path}"] = (small, large)
+    small = count_statements(engines, lambda: client.patch(f"/incidents/{ids['small incident']}", json={"status": "acknowledged"}))
+    large = count_statements(engines, lambda: client.patch(f"/incidents/{ids['large incident']}", json={"status": "acknowledged"}))
+    results["PATCH /incidents/{id}"] = (small, large)
+    return results
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["WT_DATABASE_URL"] = f"sqlite:///{tmp}/queries.db"
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        results = check_queries()
+        for name, (small, large) in results.items():
+            print(f"{name:<24} {small:3d} statements (small)   {large:3d} statements (large)   {'ok' if small == large else 'GROWS'}")
+        if any(small != large for small, large in results.values()):
+            sys.exit(1)
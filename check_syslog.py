@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+
+# TCP framing of the syslog listener over loopback, each case is the bytes one connection sends and the lines it must yield
+# usage : python check_syslog.py , exits 1 on any mismatch
+CASES = {
+    "octet counted": (b"26 <189>Jan 12 R1 %SYS-5-X: a27 <189>Jan 12 R1 %SYS-5-X: bc",
+                      ["<189>Jan 12 R1 %SYS-5-X: a", "<189>Jan 12 R1 %SYS-5-X: bc"]),
+    "octet counted with trailers": (b"5 <1>ab\n5 <1>cd\r\n", ["<1>ab", "<1>cd"]),
+    "newline": (b"<189>Jan 12 R1 one\n<189>Jan 12 R1 two\n", ["<189>Jan 12 R1 one", "<189>Jan 12 R1 two"]),
+    "cisco sequence numbers": (b"000123: *Mar  1 00:00:01 R1 %SYS-5-X: one\n000124: *Mar  1 00:00:02 R1 %SYS-5-X: two\n",
+                               ["000123: *Mar  1 00:00:01 R1 %SYS-5-X: one", "000124: *Mar  1 00:00:02 R1 %SYS-5-X: two"]),
+    "pri-less rfc 5424": (b"1 2026-01-12T10:00:00Z r1 app - - - one\n1 2026-01-12T10:00:01Z r1 app - - - two\n",
+                          ["1 2026-01-12T10:00:00Z r1 app - - - one", "1 2026-01-12T10:00:01Z r1 app - - - two"]),
+    "digits without a space": (b"1234567890\n12 <1>not counted\n", ["1234567890", "12 <1>not counted"]),
+    "oversized count": (b"99999999 <1>x\n7 <1>y\n", ["99999999 <1>x", "7 <1>y"]),
+    "last line without newline": (b"<1>one\n<1>two", ["<1>one", "<1>two"]),
+}
+
+class CollectingPipeline:
+    def __init__(self):
+        self.payloads = []
+
+    def submit(self, payloads: list):
+        self.payloads.extend(payloads)
+
+async def run_case(data: bytes, expected: int) -> list:
+    from syslog_listener import SyslogListener
+    pipeline = CollectingPipeline()
+    listener = SyslogListener(pipeline, "127.0.0.1", 0)
+    server = await asyncio.start_server(listener.handle_tcp, "127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    _, writer = await asyncio.open_connection("127.0.0.1", port)
+    # dribble the bytes so frames straddle reads
+    for i in range(0, len(data), 7):
+        writer.write(data[i:i + 7])
+        await writer.drain()
+    writer.close()
+    await writer.wait_closed()
+    for _ in range(100):
+        await asyncio.sleep(0.01)
+        if len(pipeline.payloads) >= expected:
+            break
+    server.close()
+    await server.wait_closed()
+    return [payload["log"] for payload in pipeline.payloads]
+
+async def check_syslog() -> list:
+    failures = []
+    for name, (data, expected) in CASES.items():
+        actual = await run_case(data, len(expected))
+        if actual != expected:
+            failures.append((name, expected, actual))
+    return failures
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    failures = asyncio.run(check_syslog())
+    for name, expected, actual in failures:
+        print(f"{name}\n  expected {expected}\n  actual   {actual}")
+    print(f"{len(CASES) - len(failures)}/{len(CASES)} cases ok")
+    if failures:
+        sys.exit(1)
@@ -67,7 +67,7 @@ export function IncidentsTable() {
       if (!res.ok) throw new Error("Failed to fetch incidents");
       return res.json();
     },
-    refetchInterval: 10000,
+    refetchInterval: 60000,
     refetchIntervalInBackground: true,
     staleTime: 0,
   });
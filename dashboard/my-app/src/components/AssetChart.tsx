@@ -17,7 +17,7 @@ export function AssetChart() {
       if (!res.ok) throw new Error("Failed to fetch sources");
       return res.json();
     },
-    refetchInterval: 10000,
+    refetchInterval: 60000,
     refetchIntervalInBackground: true,
     staleTime: 0,
   });
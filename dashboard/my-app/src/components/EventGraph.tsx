@@ -21,7 +21,7 @@ export function EventGraphs() {
       if (!res.ok) throw new Error("Failed to fetch events");
       return res.json();
     },
-    refetchInterval: 10000,
+    refetchInterval: 60000,
     refetchIntervalInBackground: true,
     staleTime: 0,
   });
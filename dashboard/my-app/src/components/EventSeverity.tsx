@@ -23,7 +23,7 @@ export function EventPie() {
       if (!res.ok) throw new Error("Failed to fetch severity");
       return res.json();
     },
-    refetchInterval: 10000,
+    refetchInterval: 60000,
     refetchIntervalInBackground: true,
     staleTime: 0,
   });
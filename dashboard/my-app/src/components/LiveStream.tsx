@@ -0,0 +1,77 @@
+import { useEffect } from "react";
+import { QueryClient, useQueryClient } from "@tanstack/react-query";
+
+type IngestBatch = {
+  events: unknown[];
+  alerts: unknown[];
+  incidents: unknown[];
+  counts: { events: Record<string, number>; alerts: Record<string, number> };
+};
+
+type SeverityCount = {
+  name: string;
+  value: number;
+};
+
+// a storm of batches refetches each list at most once per interval
+const REFETCH_INTERVAL = 5000;
+
+// add a batch's severity deltas to the cached pie data instead of refetching it
+function addSeverityCounts(queryClient: QueryClient, key: string, counts: Record<string, number>) {
+  if (!Object.keys(counts).length) return;
+  queryClient.setQueryData<SeverityCount[]>([key], (severities) => {
+    if (!severities) return severities;
+    const next = severities.map((severity) => ({ ...severity }));
+    for (const [name, value] of Object.entries(counts)) {
+      const severity = next.find((row) => row.name === name);
+      if (severity) severity.value += value;
+      else next.push({ name, value });
+    }
+    return next.sort((a, b) => a.name.localeCompare(b.name));
+  });
+}
+
+// refresh the dashboard queries when the backend pushes a committed ingest batch
+export function useLiveStream() {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    const source = new EventSource(`http://127.0.0.1:8000/stream`);
+    const lastRefetch = new Map<string, number>();
+    const scheduled = new Map<string, ReturnType<typeof setTimeout>>();
+
+    // refetch now if the key wasn't refetched within the interval, otherwise once at the end of it
+    const refetch = (key: string) => {
+      if (scheduled.has(key)) return;
+      const wait = Math.max(0, (lastRefetch.get(key) ?? 0) + REFETCH_INTERVAL - Date.now());
+      scheduled.set(key, setTimeout(() => {
+        scheduled.delete(key);
+        lastRefetch.set(key, Date.now());
+        queryClient.invalidateQueries({ queryKey: [key] });
+      }, wait));
+    };
+
+    source.addEventListener("ingest", (message) => {
+      const batch: IngestBatch = JSON.parse((message as MessageEvent).data);
+      addSeverityCounts(queryClient, "event-severity", batch.counts.events);
+      addSeverityCounts(queryClient, "alert-severity", batch.counts.alerts);
+      if (batch.events.length) {
+        refetch("events");
+        refetch("sources");
+      }
+      if (batch.alerts.length || batch.incidents.length) {
+        refetch("incidents");
+      }
+    });
+
+    // the server dropped messages for us, refetch everything
+    source.addEventListener("resync", () => {
+      queryClient.invalidateQueries();
+    });
+
+    return () => {
+      source.close();
+      scheduled.forEach((timer) => clearTimeout(timer));
+    };
+  }, [queryClient]);
+}
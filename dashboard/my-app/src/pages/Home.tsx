@@ -3,8 +3,11 @@ import { AssetChart } from "../components/AssetChart";
 import { IncidentsTable } from "../components/AlertTable";
 import { EventPie } from "../components/EventSeverity";
 import { AlertPie } from "../components/AlertSeverity";
+import { useLiveStream } from "../components/LiveStream";
 
 function Home() {
+    // charts refresh when /stream reports new data, the 60s refetch only catches the sliding 24h window
+    useLiveStream();
     return (
         <div className="row content g-2">
             <div className="col-12 d-flex justify-content-start">
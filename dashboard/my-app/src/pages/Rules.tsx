@@ -450,6 +450,10 @@ function RuleManagement() {
                                                 <option value="gte">gte</option>
                                                 <option value="contains">contains</option>
                                                 <option value="in">in</option>
+                                                <option value="cidr">cidr</option>
+                                                <option value="not_cidr">not_cidr</option>
+                                                <option value="port_range">port_range</option>
+                                                <option value="regex">regex</option>
                                             </select>
                                         </div>
                                     </div>
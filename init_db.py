@@ -1,9 +1,106 @@
+import sys
+import json
+from datetime import datetime
+from sqlalchemy import select, func, inspect, update, bindparam, text, LargeBinary, Text
+from sqlalchemy.orm import Session
 from database import engine
-from models_db import Base
+from models_db import Base, Asset, Event, RawLog, Alert, Incident, IncidentAlert, SeverityRollup, EventBucketRollup, AssetHourRollup
+from rollups import rebuild_rollups
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    migrate_columns()
+    migrate_indexes()
+    migrate_raw_logs()
+    migrate_rollups()
+
+# create_all doesn't alter existing tables either, add the nullable / server defaulted columns older databases lack
+def migrate_columns():
+    with engine.begin() as conn:
+        existing = inspect(conn)
+        for table in Base.metadata.sorted_tables:
+            columns = {column["name"] for column in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns or not (column.nullable or column.server_default is not None):
+                    continue
+                default = f" DEFAULT {column.server_default.arg}" if column.server_default is not None else ""
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}{default}")
+
+# create_all skips tables that already exist, so add the indexes older databases are missing
+def migrate_indexes():
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+# raw_logs used to keep the whole payload in a JSON raw_payload column, repack it into raw_line + envelope
+def migrate_raw_logs(chunk_size: int = 5000):
+    columns = {column["name"] for column in inspect(engine).get_columns("raw_logs")}
+    if "raw_payload" not in columns:
+        return
+    with engine.begin() as conn:
+        for name, type_ in (("raw_line", LargeBinary()), ("envelope", Text())):
+            if name not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE raw_logs ADD COLUMN {name} {type_.compile(dialect=engine.dialect)}")
+    table = RawLog.__table__
+    repack = update(table).where(table.c.id == bindparam("row_id")).values(raw_line=bindparam("line"), envelope=bindparam("env"))
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(text("SELECT id, raw_payload FROM raw_logs WHERE id > :last_id ORDER BY id LIMIT :limit"), {"last_id": last_id, "limit": chunk_size}).fetchall()
+            if not rows:
+                break
+            params = []
+            for row_id, payload in rows:
+                packed = RawLog(raw_payload=json.loads(payload) if isinstance(payload, str) else payload or {})
+                params.append({"row_id": row_id, "line": packed.raw_line, "env": packed.envelope})
+            conn.execute(repack, params)
+            last_id = rows[-1][0]
+    with engine.begin() as conn:
+        conn.exec_driver_sql("ALTER TABLE raw_logs DROP COLUMN raw_payload")
+
+# rollup tables start empty on a database that already has events, fill them once
+def migrate_rollups():
+    with Session(engine) as db:
+        if db.query(SeverityRollup).first() is None and db.query(Event.id).first() is not None:
+            rebuild_rollups(db)
+
+# the queries ingestion and the dashboard run all the time
+def hot_queries() -> dict:
+    since = datetime.utcnow()
+    return {
+        "event burst": select(func.count(Event.id)).where(Event.asset_id == 1, Event.event_type == "acl_deny", Event.timestamp >= since),
+        "alert burst": select(Alert.id).join(Event, Event.id == Alert.event_id).where(Event.asset_id == 1, Event.timestamp >= since).order_by(Event.timestamp.desc()).limit(3),
+        "open incidents": (select(Event.asset_id, Event.event_type, Incident.id)
+            .join(IncidentAlert, IncidentAlert.incident_id == Incident.id)
+            .join(Alert, Alert.id == IncidentAlert.alert_id)
+            .join(Event, Event.id == Alert.event_id)
+            .where(Incident.status == "open", Incident.created_at >= since)),
+        "asset by ip": select(Asset.id).where(Asset.ip_address == "10.0.0.1"),
+        "alerts of event": select(Alert.id).where(Alert.event_id == 1),
+        "raw log of event": select(RawLog.id).where(RawLog.event_id == 1),
+        "incidents of alert": select(IncidentAlert.incident_id).where(IncidentAlert.alert_id == 1),
+        "event trends": select(EventBucketRollup.bucket, EventBucketRollup.count).where(EventBucketRollup.bucket >= since),
+        "top assets": select(Asset.name, func.sum(AssetHourRollup.count)).join(AssetHourRollup, AssetHourRollup.asset_id == Asset.id).where(AssetHourRollup.hour >= since).group_by(Asset.id, Asset.name),
+    }
+
+# EXPLAIN QUERY PLAN every hot query, returns {name: plan} for those falling back to a full table scan
+def check_query_plans(bind=engine) -> dict:
+    full_scans = {}
+    if bind.dialect.name != "sqlite":
+        return full_scans
+    with bind.connect() as conn:
+        for name, statement in hot_queries().items():
+            compiled = statement.compile(dialect=bind.dialect)
+            params = tuple(None for _ in compiled.positiontup or ())
+            plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), params)]
+            if any(step.startswith("SCAN") and "USING" not in step for step in plan):
+                full_scans[name] = plan
+    return full_scans
 
 if __name__ == "__main__":
     init_db()
     print("Database initialized")
+    if full_scans := check_query_plans():
+        for name, plan in full_scans.items():
+            print(f"full scan in {name}: {plan}")
+        sys.exit(1)
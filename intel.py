@@ -0,0 +1,108 @@
+import csv
+import io
+import json
+import re
+import sys
+from ipaddress import ip_network
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.orm import Session
+from models_db import Indicator
+
+# threat intel feeds : CSV (header with indicator_type / type, value, confidence, source) or STIX-lite JSON
+# (a bundle or a list of indicator objects with a `pattern`, or plain {"indicator_type", "value"} objects)
+INDICATOR_TYPES = ("ip", "domain", "hash")
+IMPORT_CHUNK_SIZE = 2000
+HASH_RE = re.compile(r"[0-9a-f]{32,128}")
+DOMAIN_RE = re.compile(r"(?=.{1,253}$)([a-z0-9_]([a-z0-9_-]{0,61}[a-z0-9])?\.)+[a-z0-9-]{2,63}")
+# [ipv4-addr:value = '203.0.113.7'] OR [domain-name:value = 'evil.example'] OR [file:hashes.'SHA-256' = '...']
+STIX_COMPARISON_RE = re.compile(r"(ipv4-addr|ipv6-addr|domain-name|file):(?:value|hashes\.'?[\w-]+'?)\s*=\s*'([^']*)'")
+STIX_TYPES = {"ipv4-addr": "ip", "ipv6-addr": "ip", "domain-name": "domain", "file": "hash"}
+
+# canonical value of an indicator, None when it isn't valid for its type
+def normalize(indicator_type: str, value) -> str | None:
+    value = str(value or "").strip().lower()
+    if indicator_type == "ip":
+        try:
+            network = ip_network(value, strict=False)
+        except ValueError:
+            return None
+        return str(network.network_address) if network.prefixlen == network.max_prefixlen else str(network)
+    if indicator_type == "domain":
+        value = value.rstrip(".")
+        return value if DOMAIN_RE.fullmatch(value) else None
+    if indicator_type == "hash":
+        return value if HASH_RE.fullmatch(value) else None
+    return None
+
+def confidence_of(value) -> int | None:
+    try:
+        return min(max(int(value), 0), 100)
+    except (TypeError, ValueError):
+        return None
+
+def parse_csv(text: str):
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or "value" not in reader.fieldnames:
+        raise ValueError("CSV feeds need a header with at least indicator_type (or type) and value")
+    for row in reader:
+        yield {"indicator_type": (row.get("indicator_type") or row.get("type") or "").strip().lower(), "value": row.get("value"),
+               "confidence": row.get("confidence"), "source": row.get("source")}
+
+def parse_stix(text: str):
+    document = json.loads(text)
+    objects = document.get("objects", []) if isinstance(document, dict) else document
+    if not isinstance(objects, list):
+        raise ValueError("STIX feeds need a bundle with objects or a list of indicators")
+    for item in objects:
+        if not isinstance(item, dict):
+            continue
+        if "pattern" in item:
+            for kind, value in STIX_COMPARISON_RE.findall(item["pattern"]):
+                yield {"indicator_type": STIX_TYPES[kind], "value": value, "confidence": item.get("confidence"), "source": item.get("source")}
+        elif "value" in item:
+            yield {"indicator_type": str(item.get("indicator_type", "")).lower(), "value": item["value"],
+                   "confidence": item.get("confidence"), "source": item.get("source")}
+
+def parse_feed(body: bytes, feed_format: str):
+    text = body.decode("utf-8-sig")
+    if feed_format == "csv":
+        return parse_csv(text)
+    if feed_format == "stix":
+        return parse_stix(text)
+    raise ValueError("format must be csv or stix")
+
+# insert the valid rows in chunks, indicators already stored are left alone
+# each chunk commits on its own so the single writer connection is free for ingest in between
+# returns (imported, skipped) where skipped counts invalid rows and known indicators
+def import_indicators(db: Session, rows, source: str | None = None) -> tuple:
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    imported = seen = 0
+    chunk = []
+    def flush():
+        nonlocal imported
+        if chunk:
+            statement = insert(Indicator.__table__).values(chunk).on_conflict_do_nothing(index_elements=["indicator_type", "value"])
+            imported += db.execute(statement).rowcount
+            db.commit()
+            chunk.clear()
+    for row in rows:
+        seen += 1
+        value = normalize(row["indicator_type"], row["value"])
+        if value is None:
+            continue
+        row_source = row.get("source") or source
+        chunk.append({"indicator_type": row["indicator_type"], "value": value, "confidence": confidence_of(row.get("confidence")),
+                      "source": str(row_source)[:100] if row_source else None})
+        if len(chunk) >= IMPORT_CHUNK_SIZE:
+            flush()
+    flush()
+    return imported, seen - imported
+
+# usage : python intel.py feed.csv|feed.json [source]
+if __name__ == "__main__":
+    from database import SessionLocal
+    path = sys.argv[1]
+    with open(path, "rb") as feed, SessionLocal() as db:
+        imported, skipped = import_indicators(db, parse_feed(feed.read(), "stix" if path.endswith(".json") else "csv"), sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"imported {imported} indicators, skipped {skipped}")
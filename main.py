@@ -1,12 +1,23 @@
 # cors import to prevent cors errors with middleware (remove in production)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, Depends, Path
-from sqlalchemy import create_engine, event, func, desc, cast, String, Integer
-from sqlalchemy.orm import sessionmaker, Session, joinedload
+from fastapi import FastAPI, HTTPException, Depends, Path, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import create_engine, event, func, desc, String, inspect
+from sqlalchemy.orm import sessionmaker, Session, joinedload, selectinload
 from typing import List
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from database import get_db
-from models_db import Base, User, Role, UserRole, Asset, Event, RawLog, Rule, RuleCondition, Alert, Incident, AuditLog
+from database import get_db, get_read_db, SessionLocal, ReadSessionLocal, is_transient_error
+from rule_engine import rule_cache, check_condition
+from caches import asset_cache, burst_windows, incident_index, dashboard_cache, dedup_index, indicator_cache
+from pipeline import IngestPipeline, PipelineFull, PipelineClosed, PipelineTooLarge
+from syslog_listener import SyslogListener, SYSLOG_HOST, SYSLOG_PORT
+from parsers import ParsePool
+from stream import BroadcastHub
+from archive import hot_boundary, read_archived_events, read_archived_rawlogs, retention_loop
+from rollups import record_events, record_alerts, forget_asset, forget_rule, bucket_start, hour_start
+from intel import INDICATOR_TYPES, normalize, parse_feed, import_indicators
+from models_db import Base, User, Role, UserRole, Asset, Event, RawLog, Rule, RuleCondition, Alert, Incident, IncidentAlert, AuditLog, Indicator, EventIndicator, SeverityRollup, EventBucketRollup, AssetHourRollup
 from models_py import ( 
     UserCreate, UserRead, UserUpdate,
     RoleRead, RoleBase, 
@@ -24,9 +35,27 @@ from models_py import (
     EventIndicatorBase, EventIndicatorRead,
     SeverityCount, EventTrendPoint, SourceCount
     )
-import re, operator
-
-app = FastAPI()
+import csv, operator, json, asyncio
+from collections import Counter
+
+# start the ingest pipeline (and the optional syslog listener) and the retention job with the app, drain the pipeline on shutdown
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    parse_pool.start()
+    stream_hub.start()
+    await pipeline.start()
+    if syslog_listener:
+        await syslog_listener.start()
+    retention = asyncio.create_task(retention_loop(SessionLocal))
+    yield
+    retention.cancel()
+    if syslog_listener:
+        await syslog_listener.stop()
+    await pipeline.stop()
+    stream_hub.stop()
+    parse_pool.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 # remove in production
 origins = [
@@ -41,11 +70,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Prev-Cursor"],
 )
 
 # set current year
 YEAR = "2026"
 
+# relationship loading for every response model with nested fields, many-to-one joined, collections selectin
+# list and write endpoints load through these so a page costs the same number of queries whatever its size
+USER_LOAD = (selectinload(User.roles),)
+EVENT_LOAD = (joinedload(Event.asset),)
+RAWLOG_LOAD = (joinedload(RawLog.event).joinedload(Event.asset),)
+RULE_LOAD = (selectinload(Rule.conditions),)
+ALERT_LOAD = (joinedload(Alert.rule).selectinload(Rule.conditions), joinedload(Alert.event).joinedload(Event.asset))
+INCIDENT_LOAD = tuple(selectinload(Incident.alerts).options(option) for option in ALERT_LOAD)
+AUDITLOG_LOAD = (joinedload(AuditLog.user).selectinload(User.roles),)
+
+# reload a committed row with its response relationships in one go instead of refresh + lazy loads
+def reload(db: Session, row, options: tuple):
+    return db.get(type(row), inspect(row).identity, options=options, populate_existing=True)
+
+# keyset pagination for list endpoints, newest first
+#   before_id : rows older than the cursor, pass X-Next-Cursor here to get the next page
+#   after_id  : rows newer than the cursor, pass X-Prev-Cursor here to poll for new rows
+# skip / limit keep working on their own and on top of a cursor
+def paginate(query, column, response: Response, skip: int, limit: int, before_id: int | None = None, after_id: int | None = None) -> list:
+    if before_id is not None:
+        query = query.filter(column < before_id)
+    if after_id is not None:
+        rows = query.filter(column > after_id).order_by(column).offset(skip).limit(limit).all()[::-1]
+    else:
+        rows = query.order_by(desc(column)).offset(skip).limit(limit).all()
+    set_cursors(response, [getattr(row, column.key) for row in rows], limit)
+    return rows
+
+# timestamps are stored as naive UTC, an aware start / end (...Z, +02:00) is converted before comparing or filtering
+def naive_utc(value: datetime | None) -> datetime | None:
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def set_cursors(response: Response, ids: list, limit: int):
+    if ids:
+        response.headers["X-Prev-Cursor"] = str(ids[0])
+    if ids and len(ids) >= limit:
+        response.headers["X-Next-Cursor"] = str(ids[-1])
+
 
 # Users --------------------------------------------------------------------------------------------------------------------
 @app.post("/users/", response_model=UserRead)
@@ -59,12 +129,11 @@ def create_user(user_in: UserCreate, db: Session = Depends(get_db)):
         new_user.roles = roles
     db.add(new_user)
     db.commit()
-    db.refresh(new_user)
-    return new_user
+    return reload(db, new_user, USER_LOAD)
 
 @app.get("/users/", response_model=List[UserRead])
-def get_users(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(User).order_by(desc(User.id)).offset(skip).limit(limit).all())
+def get_users(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None, db: Session = Depends(get_read_db)):
+    return paginate(db.query(User).options(*USER_LOAD), User.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/users/{user_id}", response_model=UserRead)
 def update_user(user_id: int, user_in: UserUpdate, db: Session = Depends(get_db)):
@@ -81,8 +150,7 @@ def update_user(user_id: int, user_in: UserUpdate, db: Session = Depends(get_db)
         new_roles = db.query(Role).filter(Role.id.in_(update_data["role_ids"])).all()
         user.roles = new_roles  # SQLAlchemy will remove missing roles
     db.commit()
-    db.refresh(user)
-    return user
+    return reload(db, user, USER_LOAD)
 
 @app.delete("/users/{user_id}", status_code=204)
 def delete_user( user_id: int, db: Session = Depends(get_db),):
@@ -103,8 +171,8 @@ def create_role(role_in: RoleBase, db: Session = Depends(get_db)):
     return db_role
 
 @app.get("/roles/", response_model=List[RoleRead])
-def get_roles(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Role).order_by(desc(Role.id)).offset(skip).limit(limit).all())
+def get_roles(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None, db: Session = Depends(get_read_db)):
+    return paginate(db.query(Role), Role.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/roles/{role_id}", response_model=RoleRead)
 def update_role( role_id: int = Path(..., gt=0), role_in: RoleBase = ..., db: Session = Depends(get_db),):
@@ -131,12 +199,13 @@ def create_asset(asset_in: AssetCreate, db: Session = Depends(get_db)):
     asset = Asset(**asset_in.dict())
     db.add(asset)
     db.commit()
+    asset_cache.invalidate()
     db.refresh(asset)
     return asset
 
 @app.get("/assets/", response_model=List[AssetRead])
-def get_assets(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Asset).order_by(desc(Asset.id)).offset(skip).limit(limit).all())
+def get_assets(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None, db: Session = Depends(get_read_db)):
+    return paginate(db.query(Asset), Asset.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/assets/{asset_id}", response_model=AssetRead)
 def update_asset( asset_id: int, asset_in: AssetCreate, db: Session = Depends(get_db),):
@@ -146,6 +215,9 @@ def update_asset( asset_id: int, asset_in: AssetCreate, db: Session = Depends(ge
     for field, value in asset_in.dict().items():
         setattr(asset, field, value)
     db.commit()
+    asset_cache.invalidate()
+    # source-count shows asset names
+    dashboard_cache.invalidate()
     db.refresh(asset)
     return asset
 
@@ -154,8 +226,11 @@ def delete_asset(asset_id: int, db: Session = Depends(get_db)):
     asset = db.query(Asset).filter(Asset.id == asset_id).first()
     if not asset:
         raise HTTPException(status_code=404, detail="Asset not found")
+    forget_asset(db, asset_id)
     db.delete(asset)
     db.commit()
+    asset_cache.invalidate()
+    dedup_index.invalidate()
 
 
 # Events --------------------------------------------------------------------------------------------------------------------
@@ -164,15 +239,37 @@ def create_event(event_in: EventCreate, db: Session = Depends(get_db)):
     asset = db.query(Asset).get(event_in.asset_id)
     if not asset:
         raise HTTPException(status_code=404, detail="Event not found")
-    event = Event(**event_in.dict())
+    event = Event(**event_in.dict(), timestamp=datetime.utcnow())
     db.add(event)
+    record_events(db, [event])
     db.commit()
-    db.refresh(event)
-    return event
+    return reload(db, event, EVENT_LOAD)
 
+# a start reaching past the retention boundary also reads the archived day partitions overlapping the window
 @app.get("/events/", response_model=List[EventRead])
-def get_events(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Event).order_by(desc(Event.id)).offset(skip).limit(limit).all())
+def get_events(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        start: datetime | None = None, end: datetime | None = None, severity: str | None = None, asset_id: int | None = None,
+        event_type: str | None = None, db: Session = Depends(get_read_db)):
+    start, end = naive_utc(start), naive_utc(end)
+    equals = {name: value for name, value in (("severity", severity), ("asset_id", asset_id), ("event_type", event_type)) if value is not None}
+    query = db.query(Event).options(*EVENT_LOAD).filter_by(**equals)
+    if start:
+        query = query.filter(Event.timestamp >= start)
+    if end:
+        query = query.filter(Event.timestamp < end)
+    boundary = hot_boundary()
+    if after_id is not None or start is None or boundary is None or start >= boundary:
+        return paginate(query, Event.id, response, skip, limit, before_id, after_id)
+    # hot and archived ids interleave (events with alerts stay hot), take skip + limit from each side and merge by id
+    if before_id is not None:
+        query = query.filter(Event.id < before_id)
+    hot = [(event.id, event) for event in query.order_by(desc(Event.id)).limit(skip + limit)]
+    archived = read_archived_events(start, end, skip + limit, before_id, **equals)
+    assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.id.in_({row["asset_id"] for row in archived}))}
+    cold = [(row["id"], {**row, "asset": assets[row["asset_id"]]}) for row in archived if row["asset_id"] in assets]
+    page = sorted(hot + cold, key=lambda pair: pair[0], reverse=True)[skip:skip + limit]
+    set_cursors(response, [event_id for event_id, _ in page], limit)
+    return [event for _, event in page]
 
 @app.patch("/events/{event_id}", response_model=EventRead)
 def update_event( event_id: int, event_in: EventUpdate, db: Session = Depends(get_db),):
@@ -185,174 +282,30 @@ def update_event( event_id: int, event_in: EventUpdate, db: Session = Depends(ge
         if not asset:
             raise HTTPException(status_code=404, detail="Asset not found")
     update_data = event_in.dict(exclude_unset=True)
+    record_events(db, [event], -1)
     for field, value in update_data.items():
         setattr(event, field, value)
+    record_events(db, [event])
     db.commit()
-    db.refresh(event)
-    return event
+    return reload(db, event, EVENT_LOAD)
 
 @app.delete("/events/{event_id}", status_code=204)
 def delete_event(event_id: int, db: Session = Depends(get_db)):
     event = db.query(Event).get(event_id)
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
+    record_events(db, [event], -1)
+    record_alerts(db, [severity for (severity,) in db.query(Alert.severity).filter(Alert.event_id == event_id)], -1)
     db.delete(event)
     db.commit()
+    dedup_index.invalidate()
 
 
 # Logs --------------------------------------------------------------------------------------------------------------------
 # this section handles Log ingestion !
-# regex patterns
-CISCO_CONTEX_PATTERNS = re.compile(r'%([A-Z0-9_]+)-(\d+)-([A-Z0-9_]+):')
-CISCO_TIME_PATTERNS = re.compile(r'^(\w+\s+\d+\s+\d+\s+\d+:\d+:\d+)')
-CISCO_ID_PATTERNS = {
-    "src_ip": [
-        re.compile(r'\[Source:\s*(\d{1,3}(?:\.\d{1,3}){3})\]', re.IGNORECASE),
-        re.compile(r'from\s+(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
-        re.compile(r'Src IP:\s*(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
-    ],
-    "dst_ip": [
-        re.compile(r'to\s+(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
-        re.compile(r'Dst IP:\s*(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE),
-    ],
-    "src_port": [
-        re.compile(r'source port\s+(\d+)', re.IGNORECASE),
-        re.compile(r'from\s+\d{1,3}(?:\.\d{1,3}){3}\s+port\s+(\d+)', re.IGNORECASE),
-    ],
-    "dst_port": [
-        re.compile(r'\[localport:\s*(\d+)\]', re.IGNORECASE),
-        re.compile(r'to\s+\d{1,3}(?:\.\d{1,3}){3}\s+port\s+(\d+)', re.IGNORECASE),
-    ],
-}
-
-# Mapping (facility, mnemonic) -> log_type
-FACILITY_MNEMONIC_LOGTYPE_MAP = {
-    ("SYS", "CONFIG_I"): "config",
-    ("SYS", "RESTART"): "system_restart",
-    ("SYS", "CPUHOG"): "system_cpu",
-    ("SYS", "MEMORY"): "system_memory",
-    ("LINK", "UPDOWN"): "interface",
-    ("LINEPROTO", "UPDOWN"): "interface",
-    ("SEC", "IPACCESSLOGP"): "acl_permit",
-    ("SEC", "IPACCESSLOGD"): "acl_deny",
-    ("SEC_LOGIN", "LOGIN_FAILED"): "auth_fail",
-    ("SEC_LOGIN", "LOGIN_SUCCESS"): "auth_pass",
-    ("OSPF", "ADJCHG"): "routing",
-    ("BGP", "ADJCHANGE"): "routing",
-    ("PLATFORM", "PWR_FAIL"): "system_power_fail",
-    ("PLATFORM", "PWR_OK"): "system_power_ok",
-    ("PLATFORM", "FAN_FAIL"): "system_fan_fail",
-    ("DHCP", "IP_ASSIGNED"): "dhcp_assigned",
-    ("DHCP", "IP_EXPIRED"): "dhcp_expired",
-    ("AAA", "USER_AUTH"): "auth",
-    ("AAA", "AUTH_FAIL"): "auth_fail",
-}
-
-# parse CISCO type logs into a standard format
-def parse_cisco_log(db: Session, log_line, year=None):
-    result = {
-        "facility": None,
-        "severity": None,
-        "mnemonic": None,
-        "timestamp": None,
-        "src_ip": None,
-        "src_port": None,
-        "dst_ip": None,
-        "dst_port": None,
-        "log_type" : None,
-    }
-
-    # extract facility / severity / mnemonic / logtype
-    context_match = CISCO_CONTEX_PATTERNS.search(log_line)
-    if context_match:
-        result["facility"] = context_match.group(1)
-        result["severity"] = int(context_match.group(2))
-        result["mnemonic"] = context_match.group(3)
-        result["log_type"] = FACILITY_MNEMONIC_LOGTYPE_MAP.get((result["facility"], result["mnemonic"]),"system")
-
-    # extract timestamp
-    timestamp_match = CISCO_TIME_PATTERNS.match(log_line)
-    if timestamp_match:
-        ts_str = timestamp_match.group(1)
-        try:
-            ts_dt = datetime.strptime(ts_str, "%b %d %Y %H:%M:%S")
-            result["timestamp"] = ts_dt.strftime("%Y-%m-%d %H:%M:%S")
-        except ValueError:
-            result["timestamp"] = ts_str
-
-    # extract source / destination IP / ports
-    for field, regex_list in CISCO_ID_PATTERNS.items():
-        for regex in regex_list:
-            match = regex.search(log_line)
-            if match:
-                value = match.group(1)
-                result[field] = int(value) if field.endswith("_port") else value
-                break
-    
-    if result.get("src_ip") is None:
-        asset = db.query(Asset).order_by(Asset.id.asc()).first()
-        if asset and asset.ip_address:
-            result["src_ip"] = asset.ip_address
-
-    return result
-
-# helps in matching conditions to incomming logs
-def evaluate_condition(field_value, operator, condition_value):
-    if field_value is None:
-        return False
-    try:
-        if isinstance(field_value, int):
-            condition_value = int(condition_value)
-    except ValueError:
-        pass
-    if operator == "eq":
-        return field_value == condition_value
-    if operator == "neq":
-        return field_value != condition_value
-    if operator == "contains":
-        return str(condition_value).lower() in str(field_value).lower()
-    if operator == "in":
-        return field_value in condition_value.split(",")
-    if operator == "gt":
-        return field_value > condition_value
-    if operator == "lt":
-        return field_value < condition_value
-    if operator == "gte":
-        return field_value >= condition_value
-    if operator == "lte":
-        return field_value <= condition_value
-
-    return False
-
-# match rules(conditions) to incomming logs
-def match_rules(parsed_log: dict, rules: list):
-    matched_rules = []
-    for rule in rules:
-        if not rule.enabled:
-            continue
-        rule_matched = True
-        for condition in rule.conditions:
-            field = condition.field
-            operator = condition.operator
-            value = condition.value
-            field_value = parsed_log.get(field)
-            if not evaluate_condition(field_value, operator, value):
-                rule_matched = False
-                break
-        if rule_matched:
-            matched_rules.append(rule)
-
-    return matched_rules
-
-# create event
-def auto_event(event_in, db: Session):
-    asset = db.query(Asset).get(event_in.asset_id)
-    if not asset:
-        raise HTTPException(status_code=404, detail="Asset not found")
-    event = Event(**event_in.dict())
-    db.add(event)
-    db.commit()
-    return event
+# build the event of a matched log, write_batch inserts them in bulk with the one clock reading of the batch
+def new_event(parsed_log: dict, matched_rules: list, asset_id: int, now: datetime) -> Event:
+    return Event(event_type=str(parsed_log["log_type"]), severity=str(parsed_log["severity"]), message=str(f'{matched_rules[0].id}-{matched_rules[0].name}'), asset_id=asset_id, timestamp=now, occurrences=1)
 
 # create alert
 def auto_alert(alert_in, db: Session):
@@ -362,7 +315,7 @@ def auto_alert(alert_in, db: Session):
         raise HTTPException(status_code=404, detail="Rule or Event not found")
     alert = Alert(**alert_in.dict())
     db.add(alert)
-    db.commit()
+    db.flush()
     return alert
 
 # create incident
@@ -372,65 +325,198 @@ def auto_incident(inc_in, db: Session):
         alerts = ( db.query(Alert).filter(Alert.id.in_(inc_in.alert_ids)).all())
         incident.alerts.extend(alerts)
     db.add(incident)
-    db.commit()
-
-def detect_event_burst(asset_id: int, event_type: str, db: Session) -> bool:
-    window_start = datetime.utcnow() - timedelta(minutes=5)
-    event_count = ( db.query(func.count(Event.id)).filter(Event.asset_id == asset_id, Event.event_type == event_type, Event.timestamp >= window_start,).scalar())
-    return event_count >= 5
+    db.flush()
+    return incident
 
-def detect_alert_burst(asset_id: int, event_type: str, db: Session) -> bool:
-    window_start = datetime.utcnow() - timedelta(minutes=5)
-    alerts = ( db.query(Alert).join(Event).filter( Event.asset_id == asset_id, Event.timestamp >= window_start,).order_by(Event.timestamp.desc()).limit(3).all())
-    if len(alerts) < 3:
-        return []
-    consecutive_alerts = []
-    for alert in alerts:
-        if alert.event.event_type != event_type:
-            break
-        consecutive_alerts.append(alert)
-    if len(consecutive_alerts) == 3:
-        return [a.id for a in consecutive_alerts]
-    return []
-
-def get_existing_incident( asset_id: int, event_type: str, db: Session):
-    window_start = datetime.utcnow() - timedelta(minutes=60)
-    return (db.query(Incident).join(Incident.alerts).join(Alert.event).filter( Incident.status == "open", Event.asset_id == asset_id, Event.event_type == event_type, Incident.created_at >= window_start,).first())
-
-# analyze the incomming log
-def analyze_payload(log, db: Session):
-    log_line = log["log"]
-    parsed_log = parse_cisco_log(db,log_line,YEAR)
-    rules = db.query(Rule).options(joinedload(Rule.conditions)).all()
-    matched_rules = match_rules(parsed_log, rules)
+# match a parsed log against the rules, returns (parsed_log, matched_rules, asset_id) or None
+def match_parsed(parsed_log: dict, db: Session):
+    assets = asset_cache.get(db)
+    if parsed_log["src_ip"] is None:
+        parsed_log["src_ip"] = assets.fallback_ip
+    matched_rules = rule_cache.get(db).match(parsed_log)
     if any(matched_rules):
-        asset = db.query(Asset).filter(Asset.ip_address == parsed_log["src_ip"]).first()
-        event = auto_event(EventCreate(event_type=str(parsed_log["log_type"]), severity=str(parsed_log["severity"]), message=str(f'{matched_rules[0].id}-{matched_rules[0].name}'), asset_id=asset.id),db)
-        if parsed_log["severity"] < 7 and detect_event_burst(asset.id, parsed_log["log_type"],db):
-            if existing_incident:= get_existing_incident(asset.id, parsed_log["log_type"],db):
-                alert = auto_alert(AlertCreate(severity=str(parsed_log["severity"]),status="open",rule_id=matched_rules[0].id,event_id=event.id,),db)
-                existing_incident.alerts.append(alert)
-                db.commit()
+        asset_id = assets.by_ip.get(parsed_log["src_ip"])
+        if asset_id is not None:
+            return parsed_log, matched_rules, asset_id
+    return None
+
+# escalate an inserted event to alert / incident (flushes only, the caller owns the commit), returns the new alert or incident if any
+# seen : when the log arrived, later than event.timestamp for a repeat folded into an earlier event
+def correlate_event(event: Event, parsed_log: dict, matched_rules: list, asset_id: int, db: Session, seen: datetime | None = None):
+    seen = seen or event.timestamp
+    burst_windows.add_event(asset_id, event.event_type, seen)
+    now = datetime.utcnow()
+    if parsed_log["severity"] is not None and parsed_log["severity"] < 7 and burst_windows.event_burst(asset_id, event.event_type, now):
+        if existing_incident_id := incident_index.get(asset_id, event.event_type, now):
+            alert = auto_alert(AlertCreate(severity=str(parsed_log["severity"]),status="open",rule_id=matched_rules[0].id,event_id=event.id,),db)
+            burst_windows.add_alert(asset_id, event.event_type, seen, alert.id)
+            db.add(IncidentAlert(incident_id=existing_incident_id, alert_id=alert.id))
+            db.flush()
+            return alert
+        else:
+            if alert_ids := burst_windows.alert_burst(asset_id, event.event_type, now):
+                incident = auto_incident(IncidentCreate(title=f"{matched_rules[0].id}-{matched_rules[0].name}",description=matched_rules[0].description,status="open",severity=str(parsed_log["severity"]),alert_ids=alert_ids),db)
+                incident_index.add(asset_id, event.event_type, incident.id, incident.created_at)
+                return incident
             else:
-                if alert_ids := detect_alert_burst(asset.id, parsed_log["log_type"],db):
-                    incident = auto_incident(IncidentCreate(title=f"{matched_rules[0].id}-{matched_rules[0].name}",description=matched_rules[0].description,status="open",severity=str(parsed_log["severity"]),alert_ids=alert_ids),db)
-                else:
-                    alert = auto_alert(AlertCreate(severity=str(parsed_log["severity"]),status="open",rule_id=matched_rules[0].id,event_id=event.id,),db)
-        return event.id
-    return False
-
-@app.post("/rawlogs/", status_code=201)
-async def rawlogs(payload: dict, db: Session = Depends(get_db)):
-    event_id = analyze_payload(payload,db)
-    if event_id:
-        rawlog = RawLog(raw_payload=payload, event_id=event_id)
-        db.add(rawlog)
+                alert = auto_alert(AlertCreate(severity=str(parsed_log["severity"]),status="open",rule_id=matched_rules[0].id,event_id=event.id,),db)
+                burst_windows.add_alert(asset_id, event.event_type, seen, alert.id)
+                return alert
+    return None
+
+# pipeline match stage : parse the batch (in the pool when enabled) and keep only the payloads that matched a rule
+def match_batch(payloads: list) -> list:
+    parsed_logs = parse_pool.parse([payload["log"] for payload in payloads], YEAR)
+    with ReadSessionLocal() as db:
+        return [(payload, matched) for payload, parsed_log in zip(payloads, parsed_logs) if (matched := match_parsed(parsed_log, db))]
+
+# pipeline writer stage : persist a batch of matched logs in a single transaction
+# events go in with one multi-row INSERT ... RETURNING, raw logs with one executemany, then correlation runs in order
+# and the dashboard rollups are bumped in the same transaction, /stream clients hear about the batch once it's committed
+# repeats of a fingerprint still inside its dedup window only bump occurrences / last_seen of the first event and get
+# no raw log or rollup count of their own, but every sighting still goes through correlation so bursts keep alerting
+def write_batch(items: list):
+    try:
+        commit_batch(items)
+    except Exception:
+        # correlation state moved ahead of a transaction that rolled back, rebuild it from the db before the retry
+        burst_windows.invalidate()
+        incident_index.invalidate()
+        raise
+
+def commit_batch(items: list):
+    with SessionLocal() as db:
+        burst_windows.load(db)
+        incident_index.load(db)
+        now = datetime.utcnow()
+        keys = [dedup_index.fingerprint(*matched) for _, matched in items]
+        earlier = {key: dedup_index.get(key, now) for key in keys if key is not None}
+        folded_ids = {event_id for event_id in earlier.values() if event_id is not None}
+        # key -> event its repeats fold into, the ones from earlier batches loaded in one query
+        known = {event.id: event for event in db.query(Event).filter(Event.id.in_(folded_ids))} if folded_ids else {}
+        folded = {key: known[event_id] for key, event_id in earlier.items() if event_id in known}
+        fresh, sightings, pending = [], [], {}
+        for (payload, matched), key in zip(items, keys):
+            if key is not None and (event := folded.get(key)) is not None:
+                event.occurrences += 1
+                event.last_seen = now
+                sightings.append((matched, event, now))
+                continue
+            event = new_event(*matched, now)
+            if key is not None:
+                folded[key] = pending[key] = event
+            fresh.append((payload, matched, event))
+            sightings.append((matched, event, event.timestamp))
+        events = [event for _, _, event in fresh]
+        db.add_all(events)
+        db.flush()
+        db.add_all([RawLog(raw_payload=payload, event_id=event.id) for payload, _, event in fresh])
+        db.add_all(indicator_links(fresh, indicator_cache.get(db)))
+        escalations = [escalation for matched, event, seen in sightings if (escalation := correlate_event(event, *matched, db, seen))]
+        alerts = [escalation for escalation in escalations if isinstance(escalation, Alert)]
+        incidents = [escalation for escalation in escalations if isinstance(escalation, Incident)]
+        record_events(db, events)
+        record_alerts(db, [alert.severity for alert in alerts])
+        live = live_batch(events, alerts, incidents)
+        folded = [(key, event.id, event.timestamp) for key, event in pending.items()]
         db.commit()
-        return rawlog
+    # only once the events are committed
+    for key, event_id, first_seen in folded:
+        dedup_index.add(key, event_id, first_seen)
+    stream_hub.publish("ingest", live)
+
+# EventIndicator rows for the fresh events whose source or destination matches a known indicator
+def indicator_links(fresh: list, indicators) -> list:
+    links = []
+    for _, (parsed_log, _, _), event in fresh:
+        for indicator_id in dict.fromkeys(indicators.match(parsed_log["src_ip"]) + indicators.match(parsed_log["dst_ip"])):
+            links.append(EventIndicator(event_id=event.id, indicator_id=indicator_id))
+    return links
+
+# /stream message for a committed batch : the new records plus the severity count deltas
+def live_batch(events: list, alerts: list, incidents: list) -> dict:
+    return {
+        "events": [{"id": e.id, "timestamp": e.timestamp, "event_type": e.event_type, "severity": e.severity, "message": e.message, "asset_id": e.asset_id} for e in events],
+        "alerts": [{"id": a.id, "created_at": a.created_at, "severity": a.severity, "status": a.status, "rule_id": a.rule_id, "event_id": a.event_id} for a in alerts],
+        "incidents": [{"id": i.id, "created_at": i.created_at, "title": i.title, "severity": i.severity, "status": i.status} for i in incidents],
+        "counts": {"events": Counter(e.severity for e in events), "alerts": Counter(a.severity for a in alerts)},
+    }
+
+parse_pool = ParsePool()
+stream_hub = BroadcastHub()
+pipeline = IngestPipeline(match_batch, write_batch, retryable=is_transient_error)
+syslog_listener = SyslogListener(pipeline, SYSLOG_HOST, int(SYSLOG_PORT)) if SYSLOG_PORT else None
+
+# hand payloads to the pipeline, 429 when the queue is full, 413 when the batch could never fit
+def enqueue_payloads(payloads: list):
+    if not all(isinstance(payload, dict) and isinstance(payload.get("log"), str) for payload in payloads):
+        raise HTTPException(status_code=400, detail="Every log must be an object with a 'log' field")
+    try:
+        pipeline.submit(payloads)
+    except PipelineTooLarge:
+        raise HTTPException(status_code=413, detail=f"Batch is larger than the ingest queue, send at most {pipeline.queue_size} logs per request")
+    except PipelineFull:
+        raise HTTPException(status_code=429, detail="Ingest queue is full")
+    except PipelineClosed:
+        raise HTTPException(status_code=503, detail="Ingest pipeline is not running")
+
+@app.post("/rawlogs/", status_code=202)
+async def rawlogs(payload: dict):
+    enqueue_payloads([payload])
+    return {"queued": 1}
+
+# split a batch body (JSON array or NDJSON) into log dicts
+def parse_batch_body(body: bytes) -> list:
+    text = body.decode("utf-8", errors="replace").strip()
+    if not text:
+        return []
+    try:
+        if text.startswith("["):
+            payloads = json.loads(text)
+        else:
+            payloads = [json.loads(line) for line in text.splitlines() if line.strip()]
+    except json.JSONDecodeError as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {exc.msg}")
+    if not isinstance(payloads, list):
+        raise HTTPException(status_code=400, detail="Batch body must be a JSON array or NDJSON")
+    return payloads
+
+# live feed of ingested events / alerts / incidents (Server-Sent Events), see stream.py
+@app.get("/stream")
+async def stream():
+    return StreamingResponse(stream_hub.listen(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# ingest a whole batch of logs, the writer commits matched logs in batches
+@app.post("/rawlogs/batch", status_code=202)
+async def rawlogs_batch(request: Request):
+    payloads = parse_batch_body(await request.body())
+    enqueue_payloads(payloads)
+    return {"queued": len(payloads)}
 
 @app.get("/rawlogs/", response_model=List[RawLogRead])
-def get_rawlogs(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(RawLog).order_by(desc(RawLog.id)).offset(skip).limit(limit).all())
+def get_rawlogs(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        start: datetime | None = None, end: datetime | None = None, event_id: int | None = None, db: Session = Depends(get_read_db)):
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(RawLog).options(*RAWLOG_LOAD)
+    if event_id is not None:
+        query = query.filter(RawLog.event_id == event_id)
+    if start:
+        query = query.filter(RawLog.ingested_at >= start)
+    if end:
+        query = query.filter(RawLog.ingested_at < end)
+    boundary = hot_boundary()
+    if after_id is not None or start is None or boundary is None or start >= boundary:
+        return paginate(query, RawLog.id, response, skip, limit, before_id, after_id)
+    # same merge as get_events, archived raw logs come back with their archived event
+    if before_id is not None:
+        query = query.filter(RawLog.id < before_id)
+    hot = [(rawlog.id, rawlog) for rawlog in query.order_by(desc(RawLog.id)).limit(skip + limit)]
+    archived = read_archived_rawlogs(start, end, skip + limit, before_id, event_id)
+    assets = {asset.id: asset for asset in db.query(Asset).filter(Asset.id.in_({row["event"]["asset_id"] for row in archived}))}
+    cold = [(row["id"], {**row, "event": {**row["event"], "asset": assets[row["event"]["asset_id"]]}}) for row in archived if row["event"]["asset_id"] in assets]
+    page = sorted(hot + cold, key=lambda pair: pair[0], reverse=True)[skip:skip + limit]
+    set_cursors(response, [rawlog_id for rawlog_id, _ in page], limit)
+    return [rawlog for _, rawlog in page]
 
 @app.patch("/rawlogs/{rawlog_id}", response_model=RawLogRead)
 def update_rawlog( rawlog_id: int, rawlog_in: RawLogUpdate, db: Session = Depends(get_db),):
@@ -445,8 +531,7 @@ def update_rawlog( rawlog_id: int, rawlog_in: RawLogUpdate, db: Session = Depend
     if rawlog_in.raw_payload is not None:
         rawlog.raw_payload = rawlog_in.raw_payload
     db.commit()
-    db.refresh(rawlog)
-    return rawlog
+    return reload(db, rawlog, RAWLOG_LOAD)
 
 @app.delete("/rawlogs/{rawlog_id}", status_code=204)
 def delete_rawlog( rawlog_id: int, db: Session = Depends(get_db),):
@@ -458,25 +543,34 @@ def delete_rawlog( rawlog_id: int, db: Session = Depends(get_db),):
 
 
 # Rules --------------------------------------------------------------------------------------------------------------------
+def check_conditions(conditions: list):
+    for cond_in in conditions:
+        try:
+            check_condition(cond_in.operator, cond_in.value)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid {cond_in.operator} value for {cond_in.field}: {e}")
+
 @app.post("/rules/", response_model=RuleRead)
 def create_rule(rule_in: RuleCreate, db: Session = Depends(get_db)):
+    check_conditions(rule_in.conditions)
     rule = Rule( name=rule_in.name, description=rule_in.description, severity=rule_in.severity, enabled=rule_in.enabled,)
     for cond_in in rule_in.conditions:
         rule.conditions.append(RuleCondition( field=cond_in.field, operator=cond_in.operator, value=cond_in.value,))
     db.add(rule)
     db.commit()
-    db.refresh(rule)
-    return rule
+    rule_cache.invalidate()
+    return reload(db, rule, RULE_LOAD)
 
 @app.get("/rules/", response_model=List[RuleRead])
-def get_rules(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Rule).order_by(desc(Rule.id)).offset(skip).limit(limit).all())
+def get_rules(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None, db: Session = Depends(get_read_db)):
+    return paginate(db.query(Rule).options(*RULE_LOAD), Rule.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/rules/{rule_id}", response_model=RuleRead)
 def update_rule( rule_id: int, rule_in: RuleCreate, db: Session = Depends(get_db),):
     rule = db.query(Rule).filter(Rule.id == rule_id).first()
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
+    check_conditions(rule_in.conditions)
     rule.name = rule_in.name
     rule.description = rule_in.description
     rule.severity = rule_in.severity
@@ -485,16 +579,18 @@ def update_rule( rule_id: int, rule_in: RuleCreate, db: Session = Depends(get_db
     for cond_in in rule_in.conditions:
         rule.conditions.append( RuleCondition( field=cond_in.field, operator=cond_in.operator, value=cond_in.value,))
     db.commit()
-    db.refresh(rule)
-    return rule
+    rule_cache.invalidate()
+    return reload(db, rule, RULE_LOAD)
 
 @app.delete("/rules/{rule_id}", status_code=204)
 def delete_rule(rule_id: int, db: Session = Depends(get_db)):
     rule = db.query(Rule).filter(Rule.id == rule_id).first()
     if not rule:
         raise HTTPException(status_code=404, detail="Rule not found")
+    forget_rule(db, rule_id)
     db.delete(rule)
     db.commit()
+    rule_cache.invalidate()
 
 
 # Alerts --------------------------------------------------------------------------------------------------------------------
@@ -506,30 +602,46 @@ def create_alert(alert_in: AlertCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Rule or Event not found")
     alert = Alert(**alert_in.dict())
     db.add(alert)
+    record_alerts(db, [alert.severity])
     db.commit()
-    db.refresh(alert)
-    return alert
+    return reload(db, alert, ALERT_LOAD)
 
 @app.get("/alerts/", response_model=List[AlertRead])
-def get_alerts(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Alert).order_by(desc(Alert.id)).offset(skip).limit(limit).all())
+def get_alerts(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        start: datetime | None = None, end: datetime | None = None, severity: str | None = None, status: str | None = None,
+        asset_id: int | None = None, db: Session = Depends(get_read_db)):
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(Alert).options(*ALERT_LOAD)
+    if severity is not None:
+        query = query.filter(Alert.severity == severity)
+    if status is not None:
+        query = query.filter(Alert.status == status)
+    if asset_id is not None:
+        query = query.join(Event, Event.id == Alert.event_id).filter(Event.asset_id == asset_id)
+    if start:
+        query = query.filter(Alert.created_at >= start)
+    if end:
+        query = query.filter(Alert.created_at < end)
+    return paginate(query, Alert.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/alerts/{alert_id}", response_model=AlertRead)
 def update_alert( alert_id: int, alert_in: AlertUpdate,db: Session = Depends(get_db),):
     alert = db.query(Alert).get(alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
+    record_alerts(db, [alert.severity], -1)
     for field, value in alert_in.dict(exclude_unset=True).items():
         setattr(alert, field, value)
+    record_alerts(db, [alert.severity])
     db.commit()
-    db.refresh(alert)
-    return alert
+    return reload(db, alert, ALERT_LOAD)
 
 @app.delete("/alerts/{alert_id}", status_code=204)
 def delete_alert(alert_id: int, db: Session = Depends(get_db)):
     alert = db.query(Alert).get(alert_id)
     if not alert:
         raise HTTPException(status_code=404, detail="Alert not found")
+    record_alerts(db, [alert.severity], -1)
     db.delete(alert)
     db.commit()
 
@@ -543,12 +655,24 @@ def create_incident(inc_in: IncidentCreate, db: Session = Depends(get_db)):
         incident.alerts.extend(alerts)
     db.add(incident)
     db.commit()
-    db.refresh(incident)
-    return incident
+    incident_index.invalidate()
+    return reload(db, incident, INCIDENT_LOAD)
 
 @app.get("/incidents/", response_model=List[IncidentRead])
-def get_incidents(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(Incident).order_by(desc(Incident.id)).offset(skip).limit(limit).all())
+def get_incidents(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        start: datetime | None = None, end: datetime | None = None, severity: str | None = None, status: str | None = None,
+        db: Session = Depends(get_read_db)):
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(Incident).options(*INCIDENT_LOAD)
+    if severity is not None:
+        query = query.filter(Incident.severity == severity)
+    if status is not None:
+        query = query.filter(Incident.status == status)
+    if start:
+        query = query.filter(Incident.created_at >= start)
+    if end:
+        query = query.filter(Incident.created_at < end)
+    return paginate(query, Incident.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/incidents/{incident_id}", response_model=IncidentRead)
 def update_incident(incident_id: int, inc_in: IncidentUpdate, db: Session = Depends(get_db)):
@@ -568,8 +692,11 @@ def update_incident(incident_id: int, inc_in: IncidentUpdate, db: Session = Depe
             raise HTTPException(status_code=400, detail=f"Invalid alert IDs: {sorted(missing_ids)}")
         incident.alerts = alerts
     db.commit()
-    db.refresh(incident)
-    return incident
+    if "alert_ids" in data or incident.status == "open":
+        incident_index.invalidate()
+    elif incident.status != "open":
+        incident_index.discard(incident.id)
+    return reload(db, incident, INCIDENT_LOAD)
 
 @app.delete("/incidents/{incident_id}", status_code=204)
 def delete_incident(incident_id: int, db: Session = Depends(get_db)):
@@ -578,6 +705,7 @@ def delete_incident(incident_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Incident not found")
     db.delete(incident)
     db.commit()
+    incident_index.discard(incident_id)
 
 
 # Auditlogs --------------------------------------------------------------------------------------------------------------------
@@ -591,12 +719,23 @@ def create_auditlog(audit_in: AuditLogCreate, db: Session = Depends(get_db)):
     audit = AuditLog(**audit_in.dict())
     db.add(audit)
     db.commit()
-    db.refresh(audit)
-    return audit
+    return reload(db, audit, AUDITLOG_LOAD)
 
 @app.get("/auditlogs/", response_model=List[AuditLogRead])
-def get_auditlogs(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    return (db.query(AuditLog).order_by(desc(AuditLog.id)).offset(skip).limit(limit).all())
+def get_auditlogs(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        start: datetime | None = None, end: datetime | None = None, user_id: int | None = None, target_type: str | None = None,
+        db: Session = Depends(get_read_db)):
+    start, end = naive_utc(start), naive_utc(end)
+    query = db.query(AuditLog).options(*AUDITLOG_LOAD)
+    if user_id is not None:
+        query = query.filter(AuditLog.user_id == user_id)
+    if target_type is not None:
+        query = query.filter(AuditLog.target_type == target_type)
+    if start:
+        query = query.filter(AuditLog.timestamp >= start)
+    if end:
+        query = query.filter(AuditLog.timestamp < end)
+    return paginate(query, AuditLog.id, response, skip, limit, before_id, after_id)
 
 @app.patch("/auditlogs/{auditlog_id}", response_model=AuditLogRead)
 def patch_auditlog( auditlog_id: int, audit_in: AuditLogUpdate, db: Session = Depends(get_db)):
@@ -612,8 +751,7 @@ def patch_auditlog( auditlog_id: int, audit_in: AuditLogUpdate, db: Session = De
     for field, value in audit_in.dict(exclude_unset=True).items():
         setattr(audit, field, value)
     db.commit()
-    db.refresh(audit)
-    return audit
+    return reload(db, audit, AUDITLOG_LOAD)
 
 @app.delete("/auditlogs/{auditlog_id}", status_code=204)
 def delete_auditlog(auditlog_id: int, db: Session = Depends(get_db)):
@@ -624,43 +762,128 @@ def delete_auditlog(auditlog_id: int, db: Session = Depends(get_db)):
     db.commit()
 
 
+# Indicators --------------------------------------------------------------------------------------------------------------------
+@app.post("/indicators/", response_model=IndicatorRead)
+def create_indicator(indicator_in: IndicatorCreate, db: Session = Depends(get_db)):
+    value = normalize(indicator_in.indicator_type, indicator_in.value)
+    if value is None:
+        raise HTTPException(status_code=400, detail=f"Invalid indicator, indicator_type must be one of {', '.join(INDICATOR_TYPES)} with a matching value")
+    if db.query(Indicator.id).filter(Indicator.indicator_type == indicator_in.indicator_type, Indicator.value == value).first():
+        raise HTTPException(status_code=400, detail="Indicator already exists")
+    indicator = Indicator(**{**indicator_in.dict(), "value": value})
+    db.add(indicator)
+    db.commit()
+    indicator_cache.invalidate()
+    db.refresh(indicator)
+    return indicator
+
+# bulk feed import, the request body is the CSV or STIX-lite JSON document itself (see intel.py)
+@app.post("/indicators/import")
+async def import_indicator_feed(request: Request, format: str = "csv", source: str | None = None):
+    body = await request.body()
+    return await asyncio.to_thread(import_feed, body, format, source)
+
+def import_feed(body: bytes, feed_format: str, source: str | None) -> dict:
+    with SessionLocal() as db:
+        try:
+            imported, skipped = import_indicators(db, parse_feed(body, feed_format), source)
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid feed: {e}")
+        finally:
+            # chunks before a bad row are already committed
+            indicator_cache.invalidate()
+    return {"imported": imported, "skipped": skipped}
+
+@app.get("/indicators/", response_model=List[IndicatorRead])
+def get_indicators(response: Response, skip: int = 0, limit: int = 50, before_id: int | None = None, after_id: int | None = None,
+        indicator_type: str | None = None, value: str | None = None, source: str | None = None, db: Session = Depends(get_read_db)):
+    query = db.query(Indicator)
+    if indicator_type is not None:
+        query = query.filter(Indicator.indicator_type == indicator_type)
+    if value is not None:
+        query = query.filter(Indicator.value == value)
+    if source is not None:
+        query = query.filter(Indicator.source == source)
+    return paginate(query, Indicator.id, response, skip, limit, before_id, after_id)
+
+@app.delete("/indicators/{indicator_id}", status_code=204)
+def delete_indicator(indicator_id: int, db: Session = Depends(get_db)):
+    indicator = db.query(Indicator).get(indicator_id)
+    if not indicator:
+        raise HTTPException(status_code=404, detail="Indicator not found")
+    db.delete(indicator)
+    db.commit()
+    indicator_cache.invalidate()
+
+# indicator hits recorded at ingest
+@app.get("/eventindicators/", response_model=List[EventIndicatorRead])
+def get_event_indicators(skip: int = 0, limit: int = 50, event_id: int | None = None, indicator_id: int | None = None, db: Session = Depends(get_read_db)):
+    query = db.query(EventIndicator)
+    if event_id is not None:
+        query = query.filter(EventIndicator.event_id == event_id)
+    if indicator_id is not None:
+        query = query.filter(EventIndicator.indicator_id == indicator_id)
+    return query.order_by(desc(EventIndicator.event_id), EventIndicator.indicator_id).offset(skip).limit(limit).all()
+
+@app.get("/events/{event_id}/indicators", response_model=List[IndicatorRead])
+def get_event_indicator_hits(event_id: int, db: Session = Depends(get_read_db)):
+    return db.query(Indicator).join(EventIndicator, EventIndicator.indicator_id == Indicator.id).filter(EventIndicator.event_id == event_id).order_by(Indicator.id).all()
+
+
 # Home --------------------------------------------------------------------------------------------------------------------
+# Home dashboard endpoints are polled by every open tab : bodies come from dashboard_cache and
+# an If-None-Match matching the current ETag gets an empty 304
+def cached_response(request: Request, key: str, build) -> Response:
+    body, etag = dashboard_cache.get(key, build)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def severity_counts(kind: str, db: Session) -> list:
+    return [{"name": row.name, "value": row.value} for row in
+        db.query( SeverityRollup.severity.label("name"),SeverityRollup.count.label("value")).filter(SeverityRollup.kind == kind, SeverityRollup.count > 0).order_by(SeverityRollup.severity).all()]
+
 @app.get("/events/severity-count", response_model=List[SeverityCount])
-def get_event_severity_counts(db: Session = Depends(get_db)):
-    return (db.query( Event.severity.label("name"),func.count(Event.id).label("value")).group_by(Event.severity).all())
+def get_event_severity_counts(request: Request, db: Session = Depends(get_read_db)):
+    return cached_response(request, "events/severity-count", lambda: severity_counts("event", db))
 
 @app.get("/alerts/severity-count", response_model=List[SeverityCount])
-def get_event_severity_counts(db: Session = Depends(get_db)):
-    return (db.query( Alert.severity.label("name"),func.count(Alert.id).label("value")).group_by(Alert.severity).all())
+def get_event_severity_counts(request: Request, db: Session = Depends(get_read_db)):
+    return cached_response(request, "alerts/severity-count", lambda: severity_counts("alert", db))
 
 def round_time_to_nearest_5min(dt: datetime) -> str:
     return (dt - timedelta(minutes=dt.minute % 5, seconds=dt.second, microseconds=dt.microsecond)).strftime("%H:%M")
 
 @app.get("/events/event-count", response_model=List[EventTrendPoint])
-def get_event_trends(db: Session = Depends(get_db)):
+def get_event_trends(request: Request, db: Session = Depends(get_read_db)):
+    return cached_response(request, "events/event-count", lambda: event_trends(db))
+
+def event_trends(db: Session) -> list:
     now = datetime.utcnow()
     cutoff = now - timedelta(hours=24)
-    minute_bucket = ((cast(func.strftime('%M', Event.timestamp), Integer) // 30) * 30)
-    interval = (func.strftime('%Y-%m-%d %H:', Event.timestamp).op("||")(func.printf('%02d', minute_bucket)).op("||")(':00'))
-    rows = (db.query(interval.label("time"),func.count().label("events")).filter(Event.timestamp >= cutoff).group_by("time").order_by("time").all())
-    counts = {row.time: row.events for row in rows}
+    rows = (db.query(EventBucketRollup).filter(EventBucketRollup.bucket >= bucket_start(cutoff)).all())
+    counts = {row.bucket.strftime('%Y-%m-%d %H:%M:%S'): row.count for row in rows}
     intervals = []
-    current = cutoff.replace(second=0, microsecond=0, minute=(cutoff.minute // 30) * 30)
+    current = bucket_start(cutoff)
     while current <= now:
         key = current.strftime('%Y-%m-%d %H:%M:%S')
         intervals.append(key)
         current += timedelta(minutes=30)
-    result = [EventTrendPoint(time=key, events=counts.get(key, 0))for key in intervals]
-    return result
+    return [{"time": key, "events": counts.get(key, 0)} for key in intervals]
 
 @app.get("/events/source-count", response_model=List[SourceCount])
-def get_top_10_assets(db: Session = Depends(get_db)):
-    since = datetime.utcnow() - timedelta(days=1)
-    return (db.query(Asset.name.label("source"),func.count(Event.id).label("count"))
-    .join(Event, Event.asset_id == Asset.id)
-    .filter(Event.timestamp >= since)
+def get_top_10_assets(request: Request, db: Session = Depends(get_read_db)):
+    return cached_response(request, "events/source-count", lambda: top_10_assets(db))
+
+def top_10_assets(db: Session) -> list:
+    since = hour_start(datetime.utcnow() - timedelta(days=1))
+    return [{"source": row.source, "count": row.count} for row in db.query(Asset.name.label("source"),func.sum(AssetHourRollup.count).label("count"))
+    .join(AssetHourRollup, AssetHourRollup.asset_id == Asset.id)
+    .filter(AssetHourRollup.hour >= since)
     .group_by(Asset.id, Asset.name)
+    .having(func.sum(AssetHourRollup.count) > 0)
     .order_by(Asset.name.asc())   # or .desc()
     .limit(10)
     .all()
-)
+]
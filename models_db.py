@@ -1,3 +1,5 @@
+import json
+import zlib
 from datetime import datetime
 from typing import List
 from sqlalchemy import (
@@ -8,7 +10,9 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     Text,
-    JSON,
+    LargeBinary,
+    Index,
+    UniqueConstraint,
     event,
 )
 from sqlalchemy.orm import (
@@ -78,7 +82,7 @@ class Asset(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(String(100))
     asset_type: Mapped[str] = mapped_column(String(50))
-    ip_address: Mapped[str | None] = mapped_column(String(45), nullable=True)
+    ip_address: Mapped[str | None] = mapped_column(String(45), nullable=True, index=True)
     hostname: Mapped[str | None] = mapped_column(String(255), nullable=True)
     environment: Mapped[str] = mapped_column(String(50))
 
@@ -91,12 +95,21 @@ class Asset(Base):
 
 class Event(Base):
     __tablename__ = "events"
+    __table_args__ = (
+        # burst / correlation lookups : (asset, type) inside a time window
+        Index("ix_events_asset_type_time", "asset_id", "event_type", "timestamp"),
+        # dashboard : events per asset inside a time window
+        Index("ix_events_time_asset", "timestamp", "asset_id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     event_type: Mapped[str] = mapped_column(String(100), index=True)
     severity: Mapped[str] = mapped_column(String(20), index=True)
     message: Mapped[str] = mapped_column(String(500))
+    # repeats folded into this event by the dedup stage, timestamp is the first sighting
+    occurrences: Mapped[int] = mapped_column(Integer, default=1, server_default="1")
+    last_seen: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id", ondelete="CASCADE"))
 
@@ -110,16 +123,54 @@ class Event(Base):
     )
 
 
+# raw lines are deflated against a preset dictionary of common syslog tokens, short lines compress too
+# never edit RAW_LINE_DICT, stored rows need the exact bytes they were compressed with
+RAW_LINE_DICT = (
+    b"Jan Feb Mar Apr May Jun Jul Aug Sep Oct Nov Dec 2026 2027 "
+    b"%SEC-6-IPACCESSLOGP: list %SEC-6-IPACCESSLOGD: %SEC_LOGIN-4-LOGIN_FAILED: Login failed [user: ] [Source: ] [localport: ] [Reason: Login Authentication Failed] "
+    b"%LINK-3-UPDOWN: Interface GigabitEthernet0/, changed state to down up %LINEPROTO-5-UPDOWN: Line protocol on Interface "
+    b"Failed password for invalid user root admin from port ssh2 sshd[ sudo: TTY=pts/0 ; PWD= ; USER=root ; COMMAND= "
+    b"date= time= devname= type=traffic subtype=forward level=notice srcip= srcport= dstip= dstport= action=deny accept "
+    b" denied permitted tcp udp icmp from 10.0.0. 192.168. port to , 1 packet packets"
+)
+
+def pack_line(line: str) -> bytes:
+    compressor = zlib.compressobj(9, zlib.DEFLATED, -15, zdict=RAW_LINE_DICT)
+    return compressor.compress(line.encode("utf-8")) + compressor.flush()
+
+def unpack_line(data: bytes) -> str:
+    decompressor = zlib.decompressobj(-15, zdict=RAW_LINE_DICT)
+    return (decompressor.decompress(data) + decompressor.flush()).decode("utf-8")
+
 class RawLog(Base):
     __tablename__ = "raw_logs"
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"))
-    raw_payload: Mapped[dict] = mapped_column(JSON)
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"), index=True)
+    # payload["log"] compressed, the rest of the payload (source_ip, rsyslog fields ...) as compact json, NULL when empty
+    raw_line: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True)
+    envelope: Mapped[str | None] = mapped_column(Text, nullable=True)
     ingested_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     event: Mapped[Event] = relationship(back_populates="raw_log")
 
+    # the original payload dict, rebuilt only when read
+    @property
+    def raw_payload(self) -> dict:
+        payload = json.loads(self.envelope) if self.envelope else {}
+        if self.raw_line is not None:
+            payload = {"log": unpack_line(self.raw_line), **payload}
+        return payload
+
+    @raw_payload.setter
+    def raw_payload(self, payload: dict):
+        envelope = dict(payload)
+        line = envelope.pop("log", None)
+        if not isinstance(line, str):
+            envelope, line = dict(payload), None
+        self.raw_line = pack_line(line) if line is not None else None
+        self.envelope = json.dumps(envelope, separators=(",", ":")) if envelope else None
+
 
 # -------------------------
 # RULES & ALERTS
@@ -157,11 +208,11 @@ class Alert(Base):
 
     id: Mapped[int] = mapped_column(primary_key=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    severity: Mapped[str] = mapped_column(String(20))
+    severity: Mapped[str] = mapped_column(String(20), index=True)
     status: Mapped[str] = mapped_column(String(20), default="open", index=True)
 
     rule_id: Mapped[int] = mapped_column(ForeignKey("rules.id", ondelete="CASCADE"))
-    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"))
+    event_id: Mapped[int] = mapped_column(ForeignKey("events.id", ondelete="CASCADE"), index=True)
 
     rule: Mapped[Rule] = relationship()
     event: Mapped[Event] = relationship()
@@ -172,6 +223,10 @@ class Alert(Base):
 # -------------------------
 class Incident(Base):
     __tablename__ = "incidents"
+    __table_args__ = (
+        # open incidents created inside the correlation window
+        Index("ix_incidents_status_created", "status", "created_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     title: Mapped[str] = mapped_column(String(200))
@@ -193,7 +248,7 @@ class IncidentAlert(Base):
         ForeignKey("incidents.id", ondelete="CASCADE"), primary_key=True
     )
     alert_id: Mapped[int] = mapped_column(
-        ForeignKey("alerts.id", ondelete="CASCADE"), primary_key=True
+        ForeignKey("alerts.id", ondelete="CASCADE"), primary_key=True, index=True
     )
 
 
@@ -213,3 +268,57 @@ class AuditLog(Base):
     timestamp: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
     user: Mapped[User | None] = relationship()
+
+
+# -------------------------
+# THREAT INTEL
+# -------------------------
+class Indicator(Base):
+    __tablename__ = "indicators"
+    __table_args__ = (
+        # bulk imports skip indicators that are already known
+        UniqueConstraint("indicator_type", "value", name="uq_indicators_type_value"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    indicator_type: Mapped[str] = mapped_column(String(20))  # ip (address or cidr range), domain, hash
+    value: Mapped[str] = mapped_column(String(255))
+    confidence: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    source: Mapped[str | None] = mapped_column(String(100), nullable=True, index=True)
+
+
+class EventIndicator(Base):
+    __tablename__ = "event_indicators"
+
+    event_id: Mapped[int] = mapped_column(
+        ForeignKey("events.id", ondelete="CASCADE"), primary_key=True
+    )
+    indicator_id: Mapped[int] = mapped_column(
+        ForeignKey("indicators.id", ondelete="CASCADE"), primary_key=True, index=True
+    )
+
+
+# -------------------------
+# DASHBOARD ROLLUPS
+# -------------------------
+class SeverityRollup(Base):
+    __tablename__ = "rollup_severities"
+
+    kind: Mapped[str] = mapped_column(String(10), primary_key=True)  # event / alert
+    severity: Mapped[str] = mapped_column(String(20), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class EventBucketRollup(Base):
+    __tablename__ = "rollup_event_buckets"
+
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)  # start of the 30 minute bucket
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class AssetHourRollup(Base):
+    __tablename__ = "rollup_asset_hours"
+
+    hour: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id", ondelete="CASCADE"), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
@@ -65,6 +65,8 @@ class EventCreate(EventBase):
 class EventRead(EventBase):
     id: int
     timestamp: datetime
+    occurrences: int = 1
+    last_seen: Optional[datetime] = None
     asset: AssetRead
 
     class Config:
@@ -233,7 +235,7 @@ class RawLogReadWithAsset(BaseModel):
 
 
 class IndicatorBase(BaseModel):
-    indicator_type: str  # ip, domain, hash
+    indicator_type: str  # ip (address or cidr range), domain, hash
     value: str
     confidence: Optional[int] = None
     source: Optional[str] = None
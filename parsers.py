@@ -0,0 +1,361 @@
+import os
+import re
+import string
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import repeat
+import multiprocessing
+
+# worker processes used to parse big batches, 0 keeps parsing in the main process
+PARSE_WORKERS = int(os.getenv("WT_PARSE_WORKERS", "0"))
+PARSE_CHUNK_SIZE = 100
+
+# anchored timestamp, only ever tried at the start of the line
+CISCO_TIME_PATTERN = re.compile(r'(?P<time>(?P<month>\w+)\s+(?P<day>\d+)\s+(?P<year>\d+)\s+(?P<hour>\d+):(?P<minute>\d+):(?P<second>\d+))')
+
+# single pass extractor : one alternation, each branch wrapped in a named group telling what it found
+# the leading lookahead lets the scan skip every position no branch can start at
+IP = r'\d{1,3}(?:\.\d{1,3}){3}'
+CISCO_FIELDS_PATTERN = re.compile(
+    r'(?=(?i:[%\[fstd]))(?:'
+    r'(?P<context>%(?P<facility>[A-Z0-9_]+)-(?P<severity>\d+)-(?P<mnemonic>[A-Z0-9_]+):)'
+    r'|(?i:'
+    rf'(?P<source>\[Source:\s*(?P<source_ip>{IP})\])'
+    rf'|(?P<from>from\s+(?P<from_ip>{IP})(?:\s+port\s+(?P<from_port>\d+))?)'
+    rf'|(?P<src_label>Src IP:\s*(?P<src_label_ip>{IP}))'
+    rf'|(?P<to>to\s+(?P<to_ip>{IP})(?:\s+port\s+(?P<to_port>\d+))?)'
+    rf'|(?P<dst_label>Dst IP:\s*(?P<dst_label_ip>{IP}))'
+    r'|(?P<source_port>source port\s+(?P<source_port_num>\d+))'
+    r'|(?P<localport>\[localport:\s*(?P<localport_num>\d+)\])'
+    r'))'
+)
+
+# branch -> (field, group, priority), lower priority wins, ties go to the leftmost match
+CISCO_ID_GROUPS = {
+    "source": (("src_ip", "source_ip", 0),),
+    "from": (("src_ip", "from_ip", 1), ("src_port", "from_port", 1)),
+    "src_label": (("src_ip", "src_label_ip", 2),),
+    "to": (("dst_ip", "to_ip", 0), ("dst_port", "to_port", 1)),
+    "dst_label": (("dst_ip", "dst_label_ip", 1),),
+    "source_port": (("src_port", "source_port_num", 0),),
+    "localport": (("dst_port", "localport_num", 0),),
+}
+
+MONTHS = {name: number for number, name in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+
+# "%b %d %Y %H:%M:%S" -> "%Y-%m-%d %H:%M:%S", strptime only for the odd shapes the lookup can't vouch for
+def format_cisco_time(match) -> str:
+    month = MONTHS.get(match.group("month").lower())
+    day, year, hour, minute, second = match.group("day", "year", "hour", "minute", "second")
+    try:
+        if month and len(year) == 4 and year[0] != "0" and max(len(day), len(hour), len(minute), len(second)) <= 2:
+            datetime(int(year), month, int(day), int(hour), int(minute), int(second))
+            return f"{year}-{month:02d}-{int(day):02d} {int(hour):02d}:{int(minute):02d}:{int(second):02d}"
+        return datetime.strptime(match.group("time"), "%b %d %Y %H:%M:%S").strftime("%Y-%m-%d %H:%M:%S")
+    except ValueError:
+        return match.group("time")
+
+# Mapping (facility, mnemonic) -> log_type
+FACILITY_MNEMONIC_LOGTYPE_MAP = {
+    ("SYS", "CONFIG_I"): "config",
+    ("SYS", "RESTART"): "system_restart",
+    ("SYS", "CPUHOG"): "system_cpu",
+    ("SYS", "MEMORY"): "system_memory",
+    ("LINK", "UPDOWN"): "interface",
+    ("LINEPROTO", "UPDOWN"): "interface",
+    ("SEC", "IPACCESSLOGP"): "acl_permit",
+    ("SEC", "IPACCESSLOGD"): "acl_deny",
+    ("SEC_LOGIN", "LOGIN_FAILED"): "auth_fail",
+    ("SEC_LOGIN", "LOGIN_SUCCESS"): "auth_pass",
+    ("OSPF", "ADJCHG"): "routing",
+    ("BGP", "ADJCHANGE"): "routing",
+    ("PLATFORM", "PWR_FAIL"): "system_power_fail",
+    ("PLATFORM", "PWR_OK"): "system_power_ok",
+    ("PLATFORM", "FAN_FAIL"): "system_fan_fail",
+    ("DHCP", "IP_ASSIGNED"): "dhcp_assigned",
+    ("DHCP", "IP_EXPIRED"): "dhcp_expired",
+    ("AAA", "USER_AUTH"): "auth",
+    ("AAA", "AUTH_FAIL"): "auth_fail",
+}
+
+# parse CISCO type logs into a standard format
+def parse_cisco_log(log_line, year=None):
+    result = {
+        "facility": None,
+        "severity": None,
+        "mnemonic": None,
+        "timestamp": None,
+        "src_ip": None,
+        "src_port": None,
+        "dst_ip": None,
+        "dst_port": None,
+        "log_type" : None,
+    }
+
+    # extract timestamp
+    timestamp_match = CISCO_TIME_PATTERN.match(log_line)
+    if timestamp_match:
+        result["timestamp"] = format_cisco_time(timestamp_match)
+
+    best = {}
+    for match in CISCO_FIELDS_PATTERN.finditer(log_line, timestamp_match.end() if timestamp_match else 0):
+        # extract facility / severity / mnemonic / logtype
+        if match.lastgroup == "context":
+            if result["facility"] is None:
+                result["facility"] = match.group("facility")
+                result["severity"] = int(match.group("severity"))
+                result["mnemonic"] = match.group("mnemonic")
+                result["log_type"] = FACILITY_MNEMONIC_LOGTYPE_MAP.get((result["facility"], result["mnemonic"]),"system")
+        # extract source / destination IP / ports
+        else:
+            pick_endpoints(match, best)
+
+    apply_endpoints(best, result)
+    return result
+
+# keep the best candidate per src / dst ip / port field out of an id match
+def pick_endpoints(match, best: dict):
+    for field, group, priority in CISCO_ID_GROUPS[match.lastgroup]:
+        value = match.group(group)
+        if value is not None and (field not in best or priority < best[field][0]):
+            best[field] = (priority, value)
+
+def apply_endpoints(best: dict, result: dict):
+    for field, (_, value) in best.items():
+        result[field] = int(value) if field.endswith("_port") else value
+
+# src / dst ip / port out of free text, shared by the non Cisco formats
+def extract_endpoints(text: str, result: dict):
+    best = {}
+    for match in CISCO_FIELDS_PATTERN.finditer(text):
+        if match.lastgroup != "context":
+            pick_endpoints(match, best)
+    apply_endpoints(best, result)
+
+# Registry --------------------------------------------------------------------------------------------------------------------
+# every format registers a cheap sniff over the head of the line, a parser and sample lines for its benchmark
+# sniffs are anchored / bounded matches, so dispatch cost doesn't depend on the line length
+# starts lists the first characters a sniff can match (None for any), so a line is only sniffed by the formats it can be
+class LogParser:
+    __slots__ = ("name", "sniff", "parse", "samples", "starts")
+
+    def __init__(self, name: str, sniff, parse, samples: tuple, starts: str | None):
+        self.name = name
+        self.sniff = sniff
+        self.parse = parse
+        self.samples = samples
+        self.starts = starts
+
+PARSERS = []
+PARSERS_BY_NAME = {}
+# first character -> parsers to sniff in registration order, "" holds the ones for any other character
+PARSER_DISPATCH = {"": ()}
+
+def register_parser(name: str, sniff, parse, samples: tuple = (), starts: str | None = None):
+    parser = LogParser(name, sniff, parse, samples, starts)
+    PARSERS.append(parser)
+    PARSERS_BY_NAME[name] = parser
+    for char in set(PARSER_DISPATCH) | set(starts or ""):
+        PARSER_DISPATCH[char] = tuple(p for p in PARSERS if p.starts is None or (char and char in p.starts))
+    return parser
+
+PRI_PATTERN = re.compile(r'<(\d{1,3})>')
+SYSLOG_FACILITIES = ("kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news", "uucp", "cron", "authpriv", "ftp", "ntp", "security", "console", "solaris-cron",
+    "local0", "local1", "local2", "local3", "local4", "local5", "local6", "local7")
+SEVERITY_NAMES = {"emerg": 0, "emergency": 0, "alert": 1, "crit": 2, "critical": 2, "err": 3, "error": 3, "warn": 4, "warning": 4,
+    "notice": 5, "info": 6, "information": 6, "informational": 6, "debug": 7}
+
+# program -> log_type for the generic syslog formats
+PROGRAM_LOGTYPE_MAP = {
+    "sshd": "auth",
+    "sudo": "auth",
+    "su": "auth",
+    "login": "auth",
+    "systemd-logind": "auth",
+    "dhcpd": "dhcp_assigned",
+    "kernel": "system",
+    "cron": "system",
+    "CRON": "system",
+}
+
+def empty_result() -> dict:
+    return {"facility": None, "severity": None, "mnemonic": None, "timestamp": None, "src_ip": None, "src_port": None, "dst_ip": None, "dst_port": None, "log_type": None}
+
+# facility / severity out of a <PRI> header
+def apply_pri(pri, result: dict):
+    if pri is not None:
+        facility = pri >> 3
+        result["facility"] = SYSLOG_FACILITIES[facility] if facility < len(SYSLOG_FACILITIES) else str(facility)
+        result["severity"] = pri & 7
+
+def program_log_type(program, message: str) -> str:
+    log_type = PROGRAM_LOGTYPE_MAP.get(program, "system")
+    if log_type == "auth":
+        if "Failed" in message or "failure" in message or "Invalid user" in message:
+            return "auth_fail"
+        if "Accepted" in message or "session opened" in message:
+            return "auth_pass"
+    return log_type
+
+# Cisco IOS
+CISCO_SNIFF = re.compile(r'(?:\d+:\s*)?\*?(?:[A-Za-z]{3}\s+\d+\s+\d{4}\s|[^%\n]{0,80}%[A-Z0-9_]+-\d-[A-Z0-9_]+:)')
+
+def parse_cisco(line: str, year=None, pri=None) -> dict:
+    return parse_cisco_log(line, year)
+
+# RFC 5424 : 1 TIMESTAMP HOSTNAME APP-NAME PROCID MSGID [SD] MSG
+RFC5424_SNIFF = re.compile(r'[1-9]\d? (?:\d{4}-\d\d-\d\dT|- )')
+RFC5424_PATTERN = re.compile(r'(\d{1,2}) (\S+) (\S+) (\S+) (\S+) (\S+) (-|(?:\[(?:[^\]\\]|\\.)*\])+) ?(.*)', re.DOTALL)
+SD_PARAM_PATTERN = re.compile(r'([\w.-]+)="((?:[^"\\]|\\.)*)"')
+
+def parse_rfc5424(line: str, year=None, pri=None) -> dict:
+    result = empty_result()
+    apply_pri(pri, result)
+    match = RFC5424_PATTERN.match(line)
+    if not match:
+        return result
+    _, timestamp, _, app, _, msgid, structured, message = match.groups()
+    if timestamp != "-":
+        try:
+            result["timestamp"] = datetime.fromisoformat(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+        except ValueError:
+            result["timestamp"] = timestamp
+    program = None if app == "-" else app
+    result["mnemonic"] = msgid if msgid != "-" else program
+    result["log_type"] = program_log_type(program, message)
+    if structured != "-":
+        apply_key_values(dict(SD_PARAM_PATTERN.findall(structured)), result)
+    extract_endpoints(message, result)
+    return result
+
+# RFC 3164 / Linux syslog : Mmm dd hh:mm:ss HOSTNAME TAG[PID]: MSG
+RFC3164_SNIFF = re.compile(r'[A-Za-z]{3}\s+\d{1,2}\s+\d\d:\d\d:\d\d\s')
+RFC3164_PATTERN = re.compile(r'([A-Za-z]{3})\s+(\d{1,2})\s+(\d\d:\d\d:\d\d)\s+(\S+)\s+([^\s:\[]+)(?:\[\d+\])?:\s?(.*)', re.DOTALL)
+
+def parse_rfc3164(line: str, year=None, pri=None) -> dict:
+    result = empty_result()
+    apply_pri(pri, result)
+    match = RFC3164_PATTERN.match(line)
+    if not match:
+        return result
+    month_name, day, clock, _, program, message = match.groups()
+    if month := MONTHS.get(month_name.lower()):
+        result["timestamp"] = f"{year or datetime.utcnow().year}-{month:02d}-{int(day):02d} {clock}"
+    result["mnemonic"] = program
+    result["log_type"] = program_log_type(program, message)
+    extract_endpoints(message, result)
+    return result
+
+# key=value firewall logs (FortiGate, iptables style, ...)
+KV_SNIFF = re.compile(r'[A-Za-z_][\w.-]*=')
+KV_PATTERN = re.compile(r'([A-Za-z_][\w.-]*)=("(?:[^"\\]|\\.)*"|\S*)')
+KV_ALIASES = {
+    "src_ip": ("srcip", "src", "src_ip", "SRC", "sourceip"),
+    "dst_ip": ("dstip", "dst", "dst_ip", "DST", "destip"),
+    "src_port": ("srcport", "spt", "src_port", "SPT", "sport"),
+    "dst_port": ("dstport", "dpt", "dst_port", "DPT", "dport"),
+}
+KV_ACTION_LOGTYPE = {"deny": "acl_deny", "drop": "acl_deny", "block": "acl_deny", "reject": "acl_deny", "accept": "acl_permit", "allow": "acl_permit", "pass": "acl_permit", "permit": "acl_permit"}
+
+def apply_key_values(values: dict, result: dict):
+    for field, aliases in KV_ALIASES.items():
+        for alias in aliases:
+            if value := values.get(alias):
+                result[field] = int(value) if field.endswith("_port") and value.isdigit() else value
+                break
+
+def parse_key_value(line: str, year=None, pri=None) -> dict:
+    result = empty_result()
+    apply_pri(pri, result)
+    values = {key: value.strip('"') for key, value in KV_PATTERN.findall(line)}
+    apply_key_values(values, result)
+    if (level := values.get("level", values.get("severity"))) is not None:
+        result["severity"] = int(level) if level.isdigit() else SEVERITY_NAMES.get(level.lower(), result["severity"])
+    if "date" in values and "time" in values:
+        result["timestamp"] = f'{values["date"]} {values["time"]}'
+    result["facility"] = values.get("type", result["facility"])
+    action = values.get("action", "").lower()
+    result["mnemonic"] = values.get("subtype") or action or None
+    result["log_type"] = KV_ACTION_LOGTYPE.get(action, "firewall")
+    return result
+
+register_parser("rfc5424", RFC5424_SNIFF.match, parse_rfc5424, (
+    '<38>1 2026-01-12T10:00:00.123Z web01 sshd 4123 - - Failed password for root from 203.0.113.7 port 52144 ssh2',
+    '<165>1 2026-01-12T10:00:00+00:00 fw01 filterlog - ACL [meta src="10.0.0.5" dst="10.0.0.9" dport="443"] blocked',
+), starts="123456789")
+register_parser("cisco", CISCO_SNIFF.match, parse_cisco, (
+    'Jan 12 2026 10:00:00 R1 %SEC-6-IPACCESSLOGD: list 101 denied tcp from 10.0.0.1 port 1234 to 10.0.0.2 port 80, 1 packet',
+    'Mar  1 2026 23:59:59 %SEC_LOGIN-4-LOGIN_FAILED: Login failed [user: admin] [Source: 192.168.1.50] [localport: 22] [Reason: Login Authentication Failed]',
+    'Apr  3 2026 07:05:09 %LINK-3-UPDOWN: Interface GigabitEthernet0/1, changed state to down',
+))
+register_parser("rfc3164", RFC3164_SNIFF.match, parse_rfc3164, (
+    '<38>Jan 12 10:00:00 web01 sshd[4123]: Failed password for invalid user admin from 198.51.100.23 port 40022 ssh2',
+    'Jan 12 10:00:05 web01 sudo: alice : TTY=pts/0 ; PWD=/home/alice ; USER=root ; COMMAND=/bin/ls',
+), starts=string.ascii_letters)
+register_parser("kv", KV_SNIFF.match, parse_key_value, (
+    'date=2026-01-12 time=10:00:00 devname=FW1 type=traffic subtype=forward level=notice srcip=10.0.0.5 srcport=51000 dstip=8.8.8.8 dstport=53 action=deny',
+), starts=string.ascii_letters + "_")
+
+# lines no sniff claims keep going through the Cisco parser, as they always did
+DEFAULT_PARSER = PARSERS_BY_NAME["cisco"]
+
+def pick_parser(line: str) -> LogParser:
+    for parser in PARSER_DISPATCH.get(line[:1], PARSER_DISPATCH[""]):
+        if parser.sniff(line):
+            return parser
+    return DEFAULT_PARSER
+
+# strip the <PRI> header, sniff the format and parse, the result carries the format in "log_format"
+def parse_log(log_line: str, year=None) -> dict:
+    pri = None
+    if log_line.startswith("<") and (pri_match := PRI_PATTERN.match(log_line)):
+        pri = int(pri_match.group(1))
+        log_line = log_line[pri_match.end():]
+    parser = pick_parser(log_line)
+    result = parser.parse(log_line, year, pri)
+    result["log_format"] = parser.name
+    return result
+
+# parse a chunk of lines, runs inside the pool workers
+def parse_lines(log_lines: list, year=None) -> list:
+    return [parse_log(log_line, year) for log_line in log_lines]
+
+# fans batches of raw lines out to worker processes, results come back in input order
+class ParsePool:
+    def __init__(self, workers: int = PARSE_WORKERS, chunk_size: int = PARSE_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.executor = None
+
+    def start(self):
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def parse(self, log_lines: list, year=None) -> list:
+        if self.executor is None or len(log_lines) <= self.chunk_size:
+            return parse_lines(log_lines, year)
+        chunks = [log_lines[i:i + self.chunk_size] for i in range(0, len(log_lines), self.chunk_size)]
+        return [parsed_log for chunk in self.executor.map(parse_lines, chunks, repeat(year)) for parsed_log in chunk]
+
+
+# microbenchmark of every registered parser plus the dispatch overhead on the Cisco hot path
+# (Cisco lines without a sequence number start with a letter or "*", so the RFC 5424 sniff registered first skips them)
+def benchmark(number: int = 20000):
+    import timeit
+    for parser in PARSERS:
+        for sample in parser.samples:
+            assert pick_parser(PRI_PATTERN.sub("", sample, count=1)) is parser, f"{parser.name} sniff misses {sample!r}"
+        seconds = timeit.timeit(lambda: [parse_log(sample) for sample in parser.samples], number=number)
+        print(f"{parser.name:<10} {seconds / (number * len(parser.samples)) * 1e6:6.2f} us/line")
+    cisco = PARSERS_BY_NAME["cisco"].samples
+    direct = timeit.timeit(lambda: [parse_cisco_log(sample) for sample in cisco], number=number)
+    dispatched = timeit.timeit(lambda: [parse_log(sample) for sample in cisco], number=number)
+    print(f"cisco dispatch overhead {(dispatched - direct) / (number * len(cisco)) * 1e6:6.2f} us/line")
+
+if __name__ == "__main__":
+    benchmark()
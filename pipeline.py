@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# queue depth (in logs) before ingestion answers 429, and max logs handled per stage round
+INGEST_QUEUE_SIZE = int(os.getenv("WT_INGEST_QUEUE_SIZE", "10000"))
+INGEST_BATCH_SIZE = int(os.getenv("WT_INGEST_BATCH_SIZE", "500"))
+# backoff between retries of a write batch that hit a retryable error
+WRITE_RETRY_DELAY = 0.5
+WRITE_RETRY_MAX_DELAY = 30
+# seconds stop() waits for the queues to drain before dropping what is left
+INGEST_STOP_TIMEOUT = float(os.getenv("WT_INGEST_STOP_TIMEOUT", "30"))
+
+class PipelineFull(Exception):
+    pass
+
+class PipelineClosed(Exception):
+    pass
+
+# more payloads than the queue can ever hold, retrying won't help
+class PipelineTooLarge(Exception):
+    pass
+
+# staged ingestion : HTTP handlers enqueue -> match stage parses / matches rules -> writer stage batch commits
+# both stages run their blocking work in a thread so the event loop keeps serving requests
+class IngestPipeline:
+    def __init__(self, match_batch, write_batch, queue_size: int = INGEST_QUEUE_SIZE, batch_size: int = INGEST_BATCH_SIZE, retryable=None):
+        self.match_batch = match_batch  # list of payloads -> list of matched items
+        self.write_batch = write_batch  # list of matched items -> None, commits once
+        self.retryable = retryable or (lambda exc: False)  # write error -> True when it clears on its own (database locked / unreachable)
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.ingest_queue = None
+        self.write_queue = None
+        self.tasks = []
+        self.in_flight = {}  # queue -> size of the batch its stage is handling
+        self.accepting = False
+
+    async def start(self):
+        self.ingest_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.write_queue = asyncio.Queue(maxsize=self.queue_size)
+        self.tasks = [
+            asyncio.create_task(self._run_stage(self.ingest_queue, self._match)),
+            asyncio.create_task(self._run_stage(self.write_queue, self._write)),
+        ]
+        self.accepting = True
+
+    # enqueue all payloads or none of them
+    def submit(self, payloads: list):
+        if not self.accepting:
+            raise PipelineClosed()
+        if len(payloads) > self.queue_size:
+            raise PipelineTooLarge()
+        if self.ingest_queue.qsize() + len(payloads) > self.queue_size:
+            raise PipelineFull()
+        for payload in payloads:
+            self.ingest_queue.put_nowait(payload)
+
+    # stop accepting, let both stages drain (a write stuck retrying gives up after timeout), then stop the tasks
+    async def stop(self, timeout: float = INGEST_STOP_TIMEOUT):
+        self.accepting = False
+        if not self.tasks:
+            return
+        try:
+            await asyncio.wait_for(self.drain(), timeout)
+        except asyncio.TimeoutError:
+            dropped = self.ingest_queue.qsize() + self.write_queue.qsize() + sum(self.in_flight.values())
+            logger.error("ingest pipeline did not drain within %.0fs, dropping %d logs", timeout, dropped)
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    # wait until everything queued so far has been committed
+    async def drain(self):
+        await self.ingest_queue.join()
+        await self.write_queue.join()
+
+    async def _run_stage(self, queue: asyncio.Queue, handle):
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            self.in_flight[queue] = len(batch)
+            try:
+                await handle(batch)
+            except Exception:
+                logger.exception("ingest pipeline dropped a batch of %d logs", len(batch))
+            finally:
+                self.in_flight[queue] = 0
+                for _ in batch:
+                    queue.task_done()
+
+    async def _match(self, payloads: list):
+        for item in await asyncio.to_thread(self.match_batch, payloads):
+            await self.write_queue.put(item)
+
+    # logs were already answered 202, so a failed write is retried rather than dropped :
+    # retryable errors back off and try again (the queues fill up meanwhile and ingestion answers 429),
+    # anything else splits the batch so only the logs that fail on their own are lost
+    async def _write(self, items: list):
+        delay = WRITE_RETRY_DELAY
+        while True:
+            try:
+                await asyncio.to_thread(self.write_batch, items)
+                return
+            except Exception as exc:
+                if self.retryable(exc):
+                    logger.warning("ingest write of %d logs failed, retrying in %.1fs", len(items), delay, exc_info=True)
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, WRITE_RETRY_MAX_DELAY)
+                    continue
+                if len(items) == 1:
+                    raise
+                logger.warning("ingest write of %d logs failed, writing them one by one", len(items), exc_info=True)
+                for item in items:
+                    try:
+                        await self._write([item])
+                    except Exception:
+                        logger.exception("ingest pipeline dropped a log")
+                return
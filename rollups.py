@@ -0,0 +1,110 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import func, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.orm import Session
+from database import time_bucket
+from models_db import Event, Alert, SeverityRollup, EventBucketRollup, AssetHourRollup
+from caches import dashboard_cache
+
+# dashboard rollups : severity totals of events / alerts, events per 30 minute bucket and events per asset per hour
+# bumped in the transaction that inserts / deletes the rows, the dashboard endpoints read them instead of aggregating
+BUCKET_MINUTES = 30
+ROLLUP_KEEP = timedelta(days=7)
+UPSERT_CHUNK_SIZE = 1000
+
+def bucket_start(ts: datetime) -> datetime:
+    return ts.replace(minute=ts.minute // BUCKET_MINUTES * BUCKET_MINUTES, second=0, microsecond=0)
+
+def hour_start(ts: datetime) -> datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+# cached dashboard responses go stale once a transaction that touched the rollups commits
+@event.listens_for(Session, "after_commit")
+def bump_dashboard_version(session: Session):
+    if session.info.pop("rollups_changed", False):
+        dashboard_cache.invalidate()
+
+@event.listens_for(Session, "after_rollback")
+def drop_rollup_changes(session: Session):
+    session.info.pop("rollups_changed", None)
+
+# add deltas ({primary key tuple: delta}) to the rollup counts, one INSERT ... ON CONFLICT DO UPDATE per chunk
+def upsert_counts(db: Session, model, deltas: Counter):
+    table = model.__table__
+    keys = [column.name for column in table.primary_key]
+    rows = [dict(zip(keys, key), count=delta) for key, delta in deltas.items() if delta]
+    insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    if rows:
+        db.info["rollups_changed"] = True
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        statement = insert(table).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        db.execute(statement.on_conflict_do_update(index_elements=keys, set_={"count": table.c.count + statement.excluded.count}))
+
+# events : anything with severity / timestamp / asset_id (ORM objects or query rows), sign=-1 takes them back out
+def record_events(db: Session, events, sign: int = 1):
+    severities, buckets, hours = Counter(), Counter(), Counter()
+    for row in events:
+        severities["event", row.severity] += sign
+        buckets[bucket_start(row.timestamp),] += sign
+        hours[hour_start(row.timestamp), row.asset_id] += sign
+    upsert_counts(db, SeverityRollup, severities)
+    upsert_counts(db, EventBucketRollup, buckets)
+    upsert_counts(db, AssetHourRollup, hours)
+
+def record_alerts(db: Session, severities, sign: int = 1):
+    deltas = Counter()
+    for severity in severities:
+        deltas["alert", severity] += sign
+    upsert_counts(db, SeverityRollup, deltas)
+
+# deleting an asset or a rule cascades its events / alerts inside the database, take them out of the rollups first
+def forget_asset(db: Session, asset_id: int):
+    severities = Counter({("event", severity): -count for severity, count in
+        db.query(Event.severity, func.count(Event.id)).filter(Event.asset_id == asset_id).group_by(Event.severity)})
+    severities.update({("alert", severity): -count for severity, count in
+        db.query(Alert.severity, func.count(Alert.id)).join(Event, Event.id == Alert.event_id).filter(Event.asset_id == asset_id).group_by(Alert.severity)})
+    buckets = Counter()
+    for (timestamp,) in db.query(Event.timestamp).filter(Event.asset_id == asset_id, Event.timestamp >= datetime.utcnow() - ROLLUP_KEEP):
+        buckets[bucket_start(timestamp),] -= 1
+    upsert_counts(db, SeverityRollup, severities)
+    upsert_counts(db, EventBucketRollup, buckets)
+    # asset hour rows go with the asset (ON DELETE CASCADE)
+
+def forget_rule(db: Session, rule_id: int):
+    upsert_counts(db, SeverityRollup, Counter({("alert", severity): -count for severity, count in
+        db.query(Alert.severity, func.count(Alert.id)).filter(Alert.rule_id == rule_id).group_by(Alert.severity)}))
+
+# time based rollups only serve the last day, drop what the dashboard can no longer ask for
+def prune_rollups(db: Session, now: datetime | None = None):
+    before = (now or datetime.utcnow()) - ROLLUP_KEEP
+    db.query(EventBucketRollup).filter(EventBucketRollup.bucket < before).delete(synchronize_session=False)
+    db.query(AssetHourRollup).filter(AssetHourRollup.hour < before).delete(synchronize_session=False)
+    db.info["rollups_changed"] = True
+    db.commit()
+
+# recompute every rollup from the events / alerts tables (first run on an existing database, or to resync)
+def rebuild_rollups(db: Session):
+    for model in (SeverityRollup, EventBucketRollup, AssetHourRollup):
+        db.query(model).delete(synchronize_session=False)
+    db.info["rollups_changed"] = True
+    severities = Counter({("event", severity): count for severity, count in db.query(Event.severity, func.count(Event.id)).group_by(Event.severity)})
+    severities.update({("alert", severity): count for severity, count in db.query(Alert.severity, func.count(Alert.id)).group_by(Alert.severity)})
+    since = datetime.utcnow() - ROLLUP_KEEP
+    bucket = time_bucket(Event.timestamp, BUCKET_MINUTES).label("bucket")
+    buckets = Counter({(datetime.fromisoformat(row.bucket),): row.count
+        for row in db.query(bucket, func.count(Event.id).label("count")).filter(Event.timestamp >= since).group_by("bucket")})
+    hour = time_bucket(Event.timestamp, 60).label("hour")
+    hours = Counter({(datetime.fromisoformat(row.hour), row.asset_id): row.count
+        for row in db.query(hour, Event.asset_id, func.count(Event.id).label("count")).filter(Event.timestamp >= since).group_by("hour", Event.asset_id)})
+    upsert_counts(db, SeverityRollup, severities)
+    upsert_counts(db, EventBucketRollup, buckets)
+    upsert_counts(db, AssetHourRollup, hours)
+    db.commit()
+
+if __name__ == "__main__":
+    from database import SessionLocal
+    with SessionLocal() as db:
+        rebuild_rollups(db)
+        print("rollups rebuilt")
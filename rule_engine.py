@@ -0,0 +1,227 @@
+import operator
+import re
+from bisect import bisect_right
+from ipaddress import ip_network
+from operator import attrgetter
+from sqlalchemy.orm import Session, joinedload
+from models_db import Rule
+from caches import VersionedCache, address_number
+
+# comparison operators supported by rule conditions
+COMPARE_OPERATORS = {
+    "eq": operator.eq,
+    "neq": operator.ne,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "gte": operator.ge,
+    "lte": operator.le,
+}
+
+# operators whose value is parsed into a matcher, a malformed value is rejected when the rule is saved
+#   cidr / not_cidr : comma separated addresses or networks ("10.0.0.0/8,192.0.2.7")
+#   port_range      : comma separated ports or inclusive ranges ("22,8000-8100")
+#   regex           : python regular expression, searched anywhere in the field
+PARSED_OPERATORS = ("cidr", "not_cidr", "port_range", "regex")
+
+# a rule with its conditions pre-parsed into predicates
+class CompiledRule:
+    __slots__ = ("id", "name", "description", "severity", "predicates", "index_keys")
+
+    def __init__(self, rule: Rule):
+        self.id = rule.id
+        self.name = rule.name
+        self.description = rule.description
+        self.severity = rule.severity
+        self.predicates = tuple(compile_condition(c.field, c.operator, c.value) for c in rule.conditions)
+        self.index_keys = pick_index_keys(rule.conditions)
+
+    def matches(self, parsed_log: dict) -> bool:
+        for predicate in self.predicates:
+            if not predicate(parsed_log):
+                return False
+        return True
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+# overlapping / adjacent (start, end) ranges merged into sorted starts and ends, membership is then one bisect
+def merge_ranges(ranges) -> tuple:
+    starts, ends = [], []
+    for start, end in sorted(ranges):
+        if ends and start <= ends[-1] + 1:
+            ends[-1] = max(ends[-1], end)
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+def in_ranges(ranges: tuple, number: int) -> bool:
+    starts, ends = ranges
+    i = bisect_right(starts, number) - 1
+    return i >= 0 and number <= ends[i]
+
+# ip version -> merged address ranges of the networks
+def parse_cidrs(value: str) -> dict:
+    ranges = {4: [], 6: []}
+    for member in value.split(","):
+        network = ip_network(member.strip(), strict=False)
+        ranges[network.version].append((int(network.network_address), int(network.broadcast_address)))
+    return {version: merge_ranges(members) for version, members in ranges.items()}
+
+def parse_port_ranges(value: str) -> tuple:
+    ranges = []
+    for member in value.split(","):
+        low, _, high = member.strip().partition("-")
+        low, high = to_int(low), to_int(high or low)
+        if low is None or high is None or not 0 <= low <= high <= 65535:
+            raise ValueError(f"invalid port range {member.strip()!r}")
+        ranges.append((low, high))
+    return merge_ranges(ranges)
+
+# raises ValueError when a condition value can't be parsed for its operator
+def check_condition(op: str, value: str):
+    if op in ("cidr", "not_cidr"):
+        parse_cidrs(value)
+    elif op == "port_range":
+        parse_port_ranges(value)
+    elif op == "regex":
+        try:
+            re.compile(value)
+        except re.error as e:
+            raise ValueError(f"invalid regex: {e}")
+
+# turn a single condition into a predicate over a parsed log
+def compile_condition(field: str, op: str, value: str):
+    int_value = to_int(value)
+
+    if op in COMPARE_OPERATORS:
+        compare = COMPARE_OPERATORS[op]
+        def predicate(parsed_log):
+            field_value = parsed_log.get(field)
+            if field_value is None:
+                return False
+            if isinstance(field_value, int):
+                return compare(field_value, int_value) if int_value is not None else op == "neq"
+            return compare(field_value, value)
+        return predicate
+
+    if op == "contains":
+        needle = value.lower()
+        int_needle = str(int_value) if int_value is not None else needle
+        def predicate(parsed_log):
+            field_value = parsed_log.get(field)
+            if field_value is None:
+                return False
+            if isinstance(field_value, int):
+                return int_needle in str(field_value)
+            return needle in str(field_value).lower()
+        return predicate
+
+    if op == "in":
+        members = frozenset(value.split(","))
+        int_members = frozenset(i for i in map(to_int, members) if i is not None)
+        def predicate(parsed_log):
+            field_value = parsed_log.get(field)
+            if field_value is None:
+                return False
+            if isinstance(field_value, int):
+                return field_value in int_members
+            return field_value in members
+        return predicate
+
+    if op in PARSED_OPERATORS:
+        try:
+            check_condition(op, value)
+        except ValueError:
+            # saved before validation existed, never matches
+            return lambda parsed_log: False
+
+    if op in ("cidr", "not_cidr"):
+        networks = parse_cidrs(value)
+        inside = op == "cidr"
+        def predicate(parsed_log):
+            field_value = parsed_log.get(field)
+            if field_value is None:
+                return False
+            address = address_number(str(field_value))
+            if address is None:
+                return not inside
+            return in_ranges(networks[address[0]], address[1]) == inside
+        return predicate
+
+    if op == "port_range":
+        ports = parse_port_ranges(value)
+        def predicate(parsed_log):
+            port = to_int(parsed_log.get(field))
+            return port is not None and in_ranges(ports, port)
+        return predicate
+
+    if op == "regex":
+        pattern = re.compile(value)
+        def predicate(parsed_log):
+            field_value = parsed_log.get(field)
+            return field_value is not None and pattern.search(str(field_value)) is not None
+        return predicate
+
+    return lambda parsed_log: False
+
+# (field, value) keys under which a condition can be looked up, ints are keyed by their int value too
+def condition_keys(field: str, op: str, value: str) -> frozenset:
+    if op == "eq":
+        members = [value]
+    elif op == "in":
+        members = value.split(",")
+    else:
+        return frozenset()
+    keys = set()
+    for member in members:
+        keys.add((field, member))
+        if (int_member := to_int(member)) is not None:
+            keys.add((field, int_member))
+    return frozenset(keys)
+
+# pick the most selective eq / in condition of a rule to index it by
+def pick_index_keys(conditions) -> frozenset:
+    best = frozenset()
+    for condition in conditions:
+        keys = condition_keys(condition.field, condition.operator, condition.value)
+        if keys and (not best or len(keys) < len(best)):
+            best = keys
+    return best
+
+# hash index of (field, value) -> rules, so only candidate rules get their predicates checked
+class RuleIndex:
+    def __init__(self, rules: list):
+        self.rules = rules
+        self.buckets = {}
+        self.unindexed = []
+        for rule in rules:
+            if not rule.index_keys:
+                self.unindexed.append(rule)
+            for key in rule.index_keys:
+                self.buckets.setdefault(key, []).append(rule)
+        self.fields = tuple({field for field, _ in self.buckets})
+
+    def candidates(self, parsed_log: dict) -> list:
+        candidates = list(self.unindexed)
+        for field in self.fields:
+            value = parsed_log.get(field)
+            if value is not None and (bucket := self.buckets.get((field, value))):
+                candidates.extend(bucket)
+        return candidates
+
+    # matched rules in rule id order, same as a full scan would return
+    def match(self, parsed_log: dict) -> list:
+        matched = [rule for rule in self.candidates(parsed_log) if rule.matches(parsed_log)]
+        matched.sort(key=attrgetter("id"))
+        return matched
+
+# process wide rule index, rebuilt only after a rule is created / updated / deleted
+def load_rule_index(db: Session) -> RuleIndex:
+    rules = db.query(Rule).options(joinedload(Rule.conditions)).filter(Rule.enabled == True).order_by(Rule.id).all()
+    return RuleIndex([CompiledRule(rule) for rule in rules])
+
+rule_cache = VersionedCache(load_rule_index)
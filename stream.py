@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+from collections import deque
+from datetime import datetime
+
+# live push over Server-Sent Events : the ingest writer publishes what each batch created and every /stream client
+# reads it from its own bounded buffer, a slow client loses its oldest messages and gets a resync notice instead
+STREAM_BUFFER_SIZE = int(os.getenv("WT_STREAM_BUFFER_SIZE", "100"))
+STREAM_KEEPALIVE = 15
+
+def encode(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def sse(kind: str, data) -> str:
+    return f"event: {kind}\ndata: {json.dumps(data, separators=(',', ':'), default=encode)}\n\n"
+
+class Subscriber:
+    __slots__ = ("messages", "ready", "dropped")
+
+    def __init__(self, size: int):
+        self.messages = deque(maxlen=size)
+        self.ready = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, message: str):
+        if len(self.messages) == self.messages.maxlen:
+            self.dropped += 1
+        self.messages.append(message)
+        self.ready.set()
+
+class BroadcastHub:
+    def __init__(self, buffer_size: int = STREAM_BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.subscribers = set()
+        self.loop = None
+        self.closed = False
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.closed = False
+
+    # end every open stream so shutdown doesn't wait on them
+    def stop(self):
+        self.closed = True
+        for subscriber in self.subscribers:
+            subscriber.ready.set()
+
+    # safe from any thread (the writer stage runs in a worker thread), the message is encoded once for all clients
+    def publish(self, kind: str, data):
+        if self.loop is None or self.closed or not self.subscribers:
+            return
+        self.loop.call_soon_threadsafe(self._fanout, sse(kind, data))
+
+    def _fanout(self, message: str):
+        for subscriber in self.subscribers:
+            subscriber.put(message)
+
+    # SSE body for one client
+    async def listen(self):
+        subscriber = Subscriber(self.buffer_size)
+        self.subscribers.add(subscriber)
+        try:
+            yield "retry: 5000\n\n"
+            while not self.closed:
+                try:
+                    await asyncio.wait_for(subscriber.ready.wait(), STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                subscriber.ready.clear()
+                if subscriber.dropped:
+                    yield sse("resync", {"dropped": subscriber.dropped})
+                    subscriber.dropped = 0
+                while subscriber.messages and not self.closed:
+                    yield subscriber.messages.popleft()
+        finally:
+            self.subscribers.discard(subscriber)
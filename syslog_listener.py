@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import os
+from pipeline import PipelineFull, PipelineClosed
+
+logger = logging.getLogger(__name__)
+
+# native syslog receiver, disabled unless WT_SYSLOG_PORT is set (e.g. 5514, 514 needs root)
+SYSLOG_HOST = os.getenv("WT_SYSLOG_HOST", "0.0.0.0")
+SYSLOG_PORT = os.getenv("WT_SYSLOG_PORT")
+SYSLOG_MAX_MESSAGE = 64 * 1024
+
+# build the same payload rsyslog would post, the parsers read facility / severity out of the <PRI> header
+def to_payload(message: bytes, peer) -> dict:
+    line = message.decode("utf-8", errors="replace").strip()
+    return {"log": line, "source_ip": peer[0] if peer else None}
+
+# RFC 6587 framing of one TCP connection : octet counted ("LEN SP <PRI>MSG") while frames look like that, newline terminated
+# for the rest of the connection as soon as one doesn't (Cisco "000123: ..." sequence numbers and PRI-less RFC 5424
+# "1 2026-..." lines start with digits too, so a leading digit alone doesn't mean octet counting)
+OCTET_COUNT_DIGITS = len(str(SYSLOG_MAX_MESSAGE))
+
+class FrameReader:
+    def __init__(self, reader: asyncio.StreamReader):
+        self.reader = reader
+        self.octet_counting = True
+
+    # next message, None on EOF
+    async def read(self):
+        head = b""
+        if self.octet_counting:
+            # the length digits plus the byte after them
+            while len(head) <= OCTET_COUNT_DIGITS:
+                byte = await self.reader.read(1)
+                if not byte:
+                    return head or None
+                if not head and byte in b"\r\n":
+                    continue  # trailer some senders put after an octet counted frame
+                head += byte
+                if not byte.isdigit():
+                    break
+            length = int(head[:-1]) if head[:-1].isdigit() and head.endswith(b" ") else 0
+            if 0 < length <= SYSLOG_MAX_MESSAGE:
+                pri = await self.reader.read(1)
+                if pri == b"<":
+                    return pri + await self.reader.readexactly(length - 1)
+                head += pri
+            self.octet_counting = False
+        if head.endswith(b"\n"):
+            return head[:-1]
+        try:
+            return head + (await self.reader.readuntil(b"\n"))[:-1]
+        except asyncio.IncompleteReadError as exc:
+            return head + exc.partial or None
+
+class SyslogUDPProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.submit_nowait(to_payload(data, addr))
+
+# UDP + TCP listener feeding the ingest pipeline directly, bypassing the rsyslog -> HTTP hop
+class SyslogListener:
+    def __init__(self, pipeline, host: str = SYSLOG_HOST, port: int = 514):
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        self.udp_transport = None
+        self.tcp_server = None
+        self.dropped = 0
+
+    async def start(self):
+        loop = asyncio.get_running_loop()
+        self.udp_transport, _ = await loop.create_datagram_endpoint(lambda: SyslogUDPProtocol(self), local_addr=(self.host, self.port))
+        self.tcp_server = await asyncio.start_server(self.handle_tcp, self.host, self.port, limit=SYSLOG_MAX_MESSAGE)
+
+    async def stop(self):
+        if self.udp_transport:
+            self.udp_transport.close()
+        if self.tcp_server:
+            self.tcp_server.close()
+            await self.tcp_server.wait_closed()
+
+    # UDP can't push back, so a full queue drops the datagram
+    def submit_nowait(self, payload: dict):
+        if not payload["log"]:
+            return
+        try:
+            self.pipeline.submit([payload])
+        except (PipelineFull, PipelineClosed):
+            self.dropped += 1
+
+    # TCP waits for room in the queue, which stops reading from the socket and pushes back on the sender
+    async def submit(self, payload: dict):
+        if not payload["log"]:
+            return
+        while True:
+            try:
+                self.pipeline.submit([payload])
+                return
+            except PipelineFull:
+                await asyncio.sleep(0.05)
+            except PipelineClosed:
+                self.dropped += 1
+                return
+
+    async def handle_tcp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        peer = writer.get_extra_info("peername")
+        frames = FrameReader(reader)
+        try:
+            while (message := await frames.read()) is not None:
+                await self.submit(to_payload(message, peer))
+        except (ValueError, asyncio.LimitOverrunError, asyncio.IncompleteReadError, ConnectionError) as exc:
+            logger.warning("closing syslog connection from %s: %s", peer, exc)
+        finally:
+            writer.close()